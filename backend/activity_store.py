@@ -0,0 +1,446 @@
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, tzinfo
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Day indexes kept per user for timezones other than the server's
+MAX_TIMEZONES_PER_USER = 4
+
+# Below this many out-of-order entries, `extend` inserts them one by one instead of re-sorting
+MIN_MERGE_BATCH = 64
+
+# Entries copied out of a partition per step of `scan`: the first step copies
+# SCAN_FIRST_CHUNK, and each further step twice as many up to SCAN_CHUNK
+SCAN_FIRST_CHUNK = 4
+SCAN_CHUNK = 1024
+
+# Buckets of the all-users index are split once they exceed twice this size
+INDEX_BUCKET = 1024
+
+_timestamp_of = itemgetter("timestamp")
+_log_key = itemgetter("timestamp", "id")
+
+
+def _order_key(entry: Dict[str, Any]) -> Tuple[datetime, int]:
+    """(timestamp, id), the order of partitions and of the index; entries without an id sort as 0."""
+    return entry["timestamp"], entry.get("id", 0)
+
+
+def _insert_position(timestamps: List[datetime], entries: List[Dict[str, Any]], key: Tuple[datetime, int]) -> int:
+    """Index at which an entry with `key` keeps `entries` in (timestamp, id) order."""
+    idx = bisect_right(timestamps, key[0])
+    while idx and timestamps[idx - 1] == key[0] and entries[idx - 1].get("id", 0) > key[1]:
+        idx -= 1
+    return idx
+
+
+class UserAggregates:
+    """Running totals of one user's activity, updated on every insert.
+
+    Day buckets are keyed by the (server-local) calendar date of the log.
+    Reads never touch raw logs: rolling sums look up at most 30 buckets.
+    """
+
+    __slots__ = ("counts", "totals", "days", "streak_end", "streak_length")
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.totals: Dict[str, float] = {}
+        # date -> activity_type -> summed value
+        self.days: Dict[date, Dict[str, float]] = {}
+        self.streak_end: Optional[date] = None
+        self.streak_length = 0
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        activity_type = entry["activity_type"]
+        value = entry.get("value", 0)
+        self.counts[activity_type] = self.counts.get(activity_type, 0) + 1
+        self.totals[activity_type] = self.totals.get(activity_type, 0) + value
+
+        day = entry["timestamp"].date()
+        if day not in self.days:
+            self._add_day(day)
+        _add_to_day(self.days, day, activity_type, value)
+
+    def _add_day(self, day: date) -> None:
+        if self.streak_end is None or day > self.streak_end + timedelta(days=1):
+            self.streak_end, self.streak_length = day, 1
+        elif day == self.streak_end + timedelta(days=1):
+            self.streak_end, self.streak_length = day, self.streak_length + 1
+        elif day == self.streak_end - timedelta(days=self.streak_length):
+            # A late log can extend the run backwards and join an older run
+            length = self.streak_length + 1
+            while self.streak_end - timedelta(days=length) in self.days:
+                length += 1
+            self.streak_length = length
+
+    @property
+    def active_days(self) -> int:
+        return len(self.days)
+
+    def current_streak(self, today: date) -> int:
+        """Consecutive active days ending today (or yesterday, if today has no log yet)."""
+        if self.streak_end is None or self.streak_end < today - timedelta(days=1):
+            return 0
+        if self.streak_end <= today:
+            return self.streak_length
+        # Logs dated after today: count back from today instead
+        day = today if today in self.days else today - timedelta(days=1)
+        length = 0
+        while day in self.days:
+            length, day = length + 1, day - timedelta(days=1)
+        return length
+
+    def rolling(self, days: int, today: date) -> Dict[str, Any]:
+        """Active days and per-type sums over the `days` days ending today."""
+        sums: Dict[str, float] = {}
+        active = 0
+        for offset in range(days):
+            bucket = self.days.get(today - timedelta(days=offset))
+            if bucket:
+                active += 1
+                # Copied, since a bulk import may add a type to the bucket meanwhile
+                for activity_type, value in list(bucket.items()):
+                    sums[activity_type] = sums.get(activity_type, 0) + value
+        return {"active_days": active, "sums": sums}
+
+
+def _add_to_day(days: Dict[date, Dict[str, float]], day: date, activity_type: str, value: float) -> None:
+    bucket = days.get(day)
+    if bucket is None:
+        bucket = days[day] = {}
+    bucket[activity_type] = bucket.get(activity_type, 0) + value
+
+
+def bucket_series(
+    days: Dict[date, Dict[str, float]],
+    start: date,
+    end: date,
+    granularity: str = "day",
+    activity_type: Optional[str] = None,
+) -> List[Tuple[date, float]]:
+    """Sums day buckets over [start, end] into day, ISO-week or month buckets.
+
+    Returns (bucket start, value) pairs for every bucket in the range,
+    including empty ones. `activity_type=None` sums all types.
+    """
+    if granularity == "day":
+        key = lambda day: day
+    elif granularity == "week":
+        key = lambda day: day - timedelta(days=day.weekday())
+    elif granularity == "month":
+        key = lambda day: day.replace(day=1)
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    series: Dict[date, float] = {}
+    bucket = key(start)
+    while bucket <= end:
+        series[bucket] = 0
+        if granularity == "month":
+            bucket = bucket.replace(year=bucket.year + bucket.month // 12, month=bucket.month % 12 + 1)
+        else:
+            bucket += timedelta(days=1 if granularity == "day" else 7)
+
+    span = (end - start).days + 1
+    # Walk whichever is smaller: the requested range or the user's active days
+    candidates = [d for d in list(days) if start <= d <= end] if len(days) < span else (
+        start + timedelta(days=offset) for offset in range(span)
+    )
+    for day in candidates:
+        bucket = days.get(day)
+        if bucket:
+            value = sum(bucket.values()) if activity_type is None else bucket.get(activity_type, 0)
+            series[key(day)] += value
+    return list(series.items())
+
+
+class _UserLog:
+    """Logs of a single user in (timestamp, id) order, with a parallel timestamp list for bisect."""
+
+    __slots__ = ("timestamps", "entries", "aggregates", "tz_days")
+
+    def __init__(self):
+        self.timestamps: List[datetime] = []
+        self.entries: List[Dict[str, Any]] = []
+        self.aggregates = UserAggregates()
+        # tzinfo -> day buckets keyed by the local date in that timezone
+        self.tz_days: Dict[tzinfo, Dict[date, Dict[str, float]]] = {}
+
+
+class _TimeIndex:
+    """Every user's entries in (timestamp, id) order, for scans across all users.
+
+    Stored as a list of sorted buckets of at most 2 * INDEX_BUCKET entries, each
+    with a parallel timestamp list, so an insert at any point in time costs
+    O(INDEX_BUCKET) instead of O(total entries). Entries without an id sort as 0.
+    """
+
+    __slots__ = ("firsts", "timestamps", "entries")
+
+    def __init__(self):
+        # (timestamp, id) of each bucket's first entry
+        self.firsts: List[Tuple[datetime, int]] = []
+        self.timestamps: List[List[datetime]] = []
+        self.entries: List[List[Dict[str, Any]]] = []
+
+    def insert(self, entry: Dict[str, Any]) -> None:
+        key = _order_key(entry)
+        if not self.entries:
+            self.firsts.append(key)
+            self.timestamps.append([key[0]])
+            self.entries.append([entry])
+            return
+        b = max(bisect_right(self.firsts, key) - 1, 0)
+        timestamps, entries = self.timestamps[b], self.entries[b]
+        idx = _insert_position(timestamps, entries, key)
+        timestamps.insert(idx, key[0])
+        entries.insert(idx, entry)
+        if idx == 0:
+            self.firsts[b] = key
+        if len(entries) > 2 * INDEX_BUCKET:
+            half = len(entries) // 2
+            self.timestamps[b + 1:b + 1] = [timestamps[half:]]
+            self.entries[b + 1:b + 1] = [entries[half:]]
+            self.firsts.insert(b + 1, (timestamps[half], entries[half].get("id", 0)))
+            del timestamps[half:], entries[half:]
+
+    def chunk(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        after: Optional[Tuple[datetime, int]],
+        size: int,
+    ) -> List[Dict[str, Any]]:
+        """Up to `size` entries ordered after `after` (or from `start`) and before `end`."""
+        if not self.entries:
+            return []
+        if after is not None and (start is None or after[0] >= start):
+            b = max(bisect_right(self.firsts, after) - 1, 0)
+            idx = _insert_position(self.timestamps[b], self.entries[b], after)
+        elif start is not None:
+            b = max(bisect_left(self.firsts, (start,)) - 1, 0)
+            idx = bisect_left(self.timestamps[b], start)
+        else:
+            b, idx = 0, 0
+        if idx == len(self.entries[b]):
+            b, idx = b + 1, 0
+            if b == len(self.entries):
+                return []
+        timestamps = self.timestamps[b]
+        hi = bisect_left(timestamps, end, idx) if end is not None else len(timestamps)
+        return self.entries[b][idx:min(hi, idx + size)]
+
+
+class ActivityStore:
+    """In-memory activity logs partitioned by user and kept in (timestamp, id) order.
+
+    Every lookup the endpoints need (latest entry, per-user count, time-range
+    scan) only touches the requesting user's partition, so latency does not
+    grow with the total number of logs in the system.
+
+    Writes may come from other threads (bulk imports, snapshots read it too):
+    writers hold `lock`, as do reads that pair a partition's timestamps with
+    its entries. Aggregates are read without it.
+    """
+
+    def __init__(self, entries: Iterable[Dict[str, Any]] = ()):
+        self._users: Dict[Optional[str], _UserLog] = {}
+        self._index = _TimeIndex()
+        self._size = 0
+        self.lock = threading.Lock()
+        self.extend(entries)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Yields every entry, grouped by user and oldest first within a user."""
+        for user_log in list(self._users.values()):
+            with self.lock:
+                entries = list(user_log.entries)
+            yield from entries
+
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Adds a log entry; entries must carry `user_id` and a datetime `timestamp`."""
+        with self.lock:
+            user_log = self._users.get(entry["user_id"])
+            if user_log is None:
+                user_log = self._users[entry["user_id"]] = _UserLog()
+
+            timestamp = entry["timestamp"]
+            key = _order_key(entry)
+            if not user_log.entries or key >= _order_key(user_log.entries[-1]):
+                # Common case: logs arrive in time order, so this is an O(1) append
+                user_log.timestamps.append(timestamp)
+                user_log.entries.append(entry)
+            else:
+                idx = _insert_position(user_log.timestamps, user_log.entries, key)
+                user_log.timestamps.insert(idx, timestamp)
+                user_log.entries.insert(idx, entry)
+
+            user_log.aggregates.add(entry)
+            for tz, days in user_log.tz_days.items():
+                _add_to_day(days, timestamp.astimezone(tz).date(), entry["activity_type"], entry.get("value", 0))
+            self._index.insert(entry)
+            self._size += 1
+        return entry
+
+    def extend(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Adds many entries at once, merging each user's share in a single pass.
+
+        Unlike repeated `append`, a batch of old logs (e.g. a wearable backfill)
+        only re-sorts the user's entries from the batch's oldest timestamp on,
+        so a chronological backfill costs O(batch + newer entries) per call,
+        whatever the partition size. The lock is taken per user, so readers on
+        another thread wait for at most one user's share.
+        """
+        by_user: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for entry in entries:
+            by_user.setdefault(entry["user_id"], []).append(entry)
+
+        for user_id, batch in by_user.items():
+            batch.sort(key=_order_key)
+            with self.lock:
+                user_log = self._users.get(user_id)
+                if user_log is None:
+                    user_log = self._users[user_id] = _UserLog()
+
+                timestamps = user_log.timestamps
+                if not timestamps or _order_key(batch[0]) >= _order_key(user_log.entries[-1]):
+                    user_log.entries.extend(batch)
+                    timestamps.extend(map(_timestamp_of, batch))
+                elif len(batch) < MIN_MERGE_BATCH:
+                    for entry in batch:
+                        idx = _insert_position(timestamps, user_log.entries, _order_key(entry))
+                        timestamps.insert(idx, entry["timestamp"])
+                        user_log.entries.insert(idx, entry)
+                else:
+                    # Only entries ordered after the batch's first need merging: two sorted
+                    # runs, which the sort merges in one pass
+                    idx = _insert_position(timestamps, user_log.entries, _order_key(batch[0]))
+                    merged = user_log.entries[idx:] + batch
+                    merged.sort(key=_order_key)
+                    user_log.entries[idx:] = merged
+                    timestamps[idx:] = map(_timestamp_of, merged)
+
+                for entry in batch:
+                    user_log.aggregates.add(entry)
+                    for tz, days in user_log.tz_days.items():
+                        _add_to_day(days, entry["timestamp"].astimezone(tz).date(), entry["activity_type"], entry.get("value", 0))
+                    self._index.insert(entry)
+                self._size += len(batch)
+
+    def users(self) -> List[Optional[str]]:
+        return list(self._users)
+
+    def count(self, user_id: Optional[str]) -> int:
+        user_log = self._users.get(user_id)
+        return len(user_log.entries) if user_log else 0
+
+    def aggregates(self, user_id: Optional[str]) -> Optional[UserAggregates]:
+        user_log = self._users.get(user_id)
+        return user_log.aggregates if user_log else None
+
+    def day_buckets(self, user_id: Optional[str], tz: Optional[tzinfo] = None) -> Dict[date, Dict[str, float]]:
+        """Day buckets of a user keyed by calendar date, summed per activity type.
+
+        Without `tz` dates are server-local. The index for another timezone is
+        built from the user's logs on first use and maintained on insert from
+        then on; naive timestamps are taken to be server-local time.
+        """
+        user_log = self._users.get(user_id)
+        if not user_log:
+            return {}
+        if tz is None:
+            return user_log.aggregates.days
+
+        days = user_log.tz_days.get(tz)
+        if days is None:
+            days = {}
+            with self.lock:
+                if len(user_log.tz_days) >= MAX_TIMEZONES_PER_USER:
+                    del user_log.tz_days[next(iter(user_log.tz_days))]
+                for entry in user_log.entries:
+                    _add_to_day(days, entry["timestamp"].astimezone(tz).date(), entry["activity_type"], entry.get("value", 0))
+                user_log.tz_days[tz] = days
+        return days
+
+    def latest(self, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Returns the most recent entry of a user, or None if they have no logs."""
+        user_log = self._users.get(user_id)
+        return user_log.entries[-1] if user_log and user_log.entries else None
+
+    def scan(
+        self,
+        user_ids: Optional[Iterable[Optional[str]]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        activity_type: Optional[str] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yields entries in (timestamp, id) order, for all users unless `user_ids` is given.
+
+        `after` is a keyset cursor: only entries ordered after that (timestamp, id)
+        are returned. Entries need the `id` the storage backend assigned. Each user
+        is read a chunk at a time and re-seeked by key, so a scan tolerates inserts
+        made while it runs and holds one chunk at a time. Without `user_ids` the
+        scan reads the all-users index, so memory and time to the first entry
+        depend on neither the number of logs nor of users. Given users are merged;
+        their chunks start at SCAN_FIRST_CHUNK entries and double up to SCAN_CHUNK.
+        """
+        if user_ids is None:
+            return _scan_index(self.lock, self._index, start, end, activity_type, after)
+        user_logs = [self._users[user_id] for user_id in user_ids if user_id in self._users]
+        scans = [_scan_user(self.lock, user_log, start, end, activity_type, after) for user_log in user_logs]
+        if len(scans) == 1:
+            return scans[0]
+        return heapq.merge(*scans, key=_log_key)
+
+
+def _scan_user(
+    lock: threading.Lock,
+    user_log: _UserLog,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    activity_type: Optional[str],
+    after: Optional[Tuple[datetime, int]],
+) -> Iterator[Dict[str, Any]]:
+    size = SCAN_FIRST_CHUNK
+    while True:
+        with lock:
+            timestamps = user_log.timestamps
+            if after is not None and (start is None or after[0] >= start):
+                lo = _insert_position(timestamps, user_log.entries, after)
+            else:
+                lo = bisect_left(timestamps, start) if start is not None else 0
+            hi = bisect_left(timestamps, end) if end is not None else len(timestamps)
+            chunk = user_log.entries[lo:min(hi, lo + size)]
+        if not chunk:
+            return
+        for entry in chunk:
+            if activity_type is None or entry["activity_type"] == activity_type:
+                yield entry
+        after = _log_key(chunk[-1])
+        size = min(size * 2, SCAN_CHUNK)
+
+
+def _scan_index(
+    lock: threading.Lock,
+    index: _TimeIndex,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    activity_type: Optional[str],
+    after: Optional[Tuple[datetime, int]],
+) -> Iterator[Dict[str, Any]]:
+    while True:
+        with lock:
+            chunk = index.chunk(start, end, after, SCAN_CHUNK)
+        if not chunk:
+            return
+        for entry in chunk:
+            if activity_type is None or entry["activity_type"] == activity_type:
+                yield entry
+        after = _log_key(chunk[-1])
@@ -1,14 +1,61 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from typing import List, Optional
 import uvicorn
+import asyncio
+import base64
+import csv
+import io
+import itertools
 import json
-from datetime import datetime, timedelta
-from nlp_utils import SimpleNLP
-from health_model import HealthRecommender
+import os
+import secrets
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from nlp_utils import SimpleNLP, fold_query, model_loader
+from health_model import HealthRecommender, MAX_PROJECTION_WEEKS, VEGAN_RECOMMENDATION, decode_recommendations
+from activity_store import ActivityStore, bucket_series
+from storage import MemoryBackend, StoreSync, open_backend, restore, save_snapshot
+from worker_pool import PoolBusyError, WorkerPool
+from cache import LRUCache, RedisCache, fingerprint
+from metrics import REGISTRY, MetricsMiddleware, SamplingProfiler, stage
+from response_catalog import DEFAULT_PATH as DEFAULT_RESPONSES_PATH, ResponseCatalog
 
-app = FastAPI(title="Wellora Backend", description="Health Assistant API with NLP & ML")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Rebuild the in-memory index from the snapshot plus the log tail it doesn't cover
+    if not isinstance(storage, MemoryBackend):
+        restore(activity_store, storage, DATA_DIR)
+        # Snapshots as the store grows bound what a crash replays; also picks up other workers' writes
+        store_sync = StoreSync(
+            activity_store, storage, DATA_DIR,
+            snapshot_every=int(os.environ.get("WELLORA_SNAPSHOT_EVERY", "100000")),
+            snapshot_interval=float(os.environ.get("WELLORA_SNAPSHOT_INTERVAL", "600")),
+            poll=float(os.environ.get("WELLORA_STORAGE_POLL", "1")),
+        ).start()
+    # The spaCy model is never loaded on import (WELLORA_SPACY_LOAD, see nlp_utils.ModelLoader)
+    if model_loader.mode == "eager":
+        model_loader.load()
+    elif model_loader.mode == "background":
+        model_loader.load_in_background()
+    yield
+    worker_pool.shutdown()
+    if not isinstance(storage, MemoryBackend):
+        store_sync.stop()
+        storage.close()
+        save_snapshot(activity_store, DATA_DIR)
+
+app = FastAPI(title="Wellora Backend", description="Health Assistant API with NLP & ML", lifespan=lifespan)
+
+# Per-route request counts, latency and body sizes for /metrics (WELLORA_METRICS=0 turns them off);
+# WELLORA_PROFILE_EVERY=N profiles one request in N, see /admin/profiler
+REGISTRY.enabled = os.environ.get("WELLORA_METRICS", "1") != "0"
+profiler = SamplingProfiler(every=int(os.environ.get("WELLORA_PROFILE_EVERY", "0")))
+app.add_middleware(MetricsMiddleware, profiler=profiler)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,9 +65,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-nlp = SimpleNLP()
+# WELLORA_INTENT_MATCH=word only counts whole-word keyword hits ("eat" no longer matches "great");
+# WELLORA_NER_MODE picks when spaCy NER runs: fallback (default), always or never
+nlp = SimpleNLP(
+    whole_word=os.environ.get("WELLORA_INTENT_MATCH", "substring") == "word",
+    ner_mode=os.environ.get("WELLORA_NER_MODE", "fallback"),
+)
 recommender = HealthRecommender()
 
+# Assistant advice strings; WELLORA_RESPONSE_SEED makes the selection deterministic. Every worker
+# reloads the file once it changed, checking at most every WELLORA_RESPONSES_CHECK_INTERVAL seconds
+response_catalog = ResponseCatalog(
+    os.environ.get("WELLORA_RESPONSES_PATH", DEFAULT_RESPONSES_PATH),
+    seed=int(os.environ["WELLORA_RESPONSE_SEED"]) if os.environ.get("WELLORA_RESPONSE_SEED") else None,
+    check_interval=float(os.environ.get("WELLORA_RESPONSES_CHECK_INTERVAL", "5")) or None,
+)
+
+# CPU-bound NLP and report work runs in a bounded pool so it can't stall the event loop.
+# WELLORA_POOL_WORKERS=0 runs it inline; WELLORA_POOL_KIND=process uses forked worker processes.
+worker_pool = WorkerPool(
+    max_workers=int(os.environ.get("WELLORA_POOL_WORKERS", "4")),
+    max_queue=int(os.environ.get("WELLORA_POOL_QUEUE", "64")),
+    kind=os.environ.get("WELLORA_POOL_KIND", "thread"),
+)
+
+# Generated reports keyed by a normalized request fingerprint: an in-process LRU by default,
+# or shared by all workers through a Redis-compatible server when WELLORA_REPORT_CACHE_URL is set.
+# WELLORA_REPORT_CACHE_TTL=0, like WELLORA_REPORT_CACHE_SIZE=0, disables the cache.
+REPORT_CACHE_TTL = float(os.environ.get("WELLORA_REPORT_CACHE_TTL", "3600"))
+if REPORT_CACHE_TTL < 0:
+    raise ValueError("WELLORA_REPORT_CACHE_TTL must not be negative")
+if REPORT_CACHE_TTL == 0:
+    report_cache = LRUCache(max_size=0)
+elif os.environ.get("WELLORA_REPORT_CACHE_URL"):
+    report_cache = RedisCache(os.environ["WELLORA_REPORT_CACHE_URL"], ttl=REPORT_CACHE_TTL, prefix="wellora:report:")
+else:
+    report_cache = LRUCache(max_size=int(os.environ.get("WELLORA_REPORT_CACHE_SIZE", "4096")), ttl=REPORT_CACHE_TTL)
+
+@app.exception_handler(PoolBusyError)
+async def pool_busy_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Server is busy, please retry."}, headers={"Retry-After": "1"})
+
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request, exc):
+    # FastAPI's default handler echoes each rejected input, which fails to serialize
+    # when it is the NaN or the lone surrogate being rejected
+    errors = [{key: err[key] for key in ("type", "loc", "msg") if key in err} for err in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": errors})
+
 # Data Models
 class UserQuery(BaseModel):
     text: str
@@ -34,162 +126,350 @@ class HealthReportRequest(BaseModel):
     dietary_preferences: List[str]
     health_goals: List[str]
 
+class WeightProjectionRequest(BaseModel):
+    age: int
+    weight: float
+    height: float
+    activity_level: str
+    # Daily calories relative to TDEE, one projection per offset
+    calorie_offsets: List[float] = [-750, -500, -250, 0, 250]
+    weeks: int = 52
+
+class HealthReportBatchRequest(BaseModel):
+    # Columnar: one list per field, all of the same length
+    age: List[int]
+    weight: List[float]
+    height: List[float]
+    activity_level: List[str]
+    dietary_preferences: Optional[List[List[str]]] = None
+    health_goals: Optional[List[List[str]]] = None
+    chunk_size: int = 10000
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Wellora Health Assistant API"}
 
+@app.get("/ready")
+def ready(require_nlp: bool = False):
+    """
+    Readiness probe. The API serves without the spaCy model (entities then come
+    from the keyword gazetteer alone), so it is ready unless require_nlp=true
+    is passed and the model is not loaded yet.
+    """
+    nlp_status = model_loader.describe()
+    ok = not require_nlp or nlp_status["status"] == "ready"
+    return JSONResponse(status_code=200 if ok else 503, content={"ready": ok, "pid": os.getpid(), "nlp": nlp_status})
+
+# The /admin routes are only served when WELLORA_ADMIN_TOKEN is set, and only to requests that send
+# it as "Authorization: Bearer <token>"; CORS lets any origin call the API
+ADMIN_TOKEN = os.environ.get("WELLORA_ADMIN_TOKEN", "")
+
+def require_admin(request: Request):
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+admin = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+@admin.post("/reload_responses")
+def reload_responses():
+    """Reloads the response catalog now, in the worker that serves this request (the others pick
+    the edit up on their next check)."""
+    try:
+        reloaded = response_catalog.reload()
+    except (OSError, ValueError, KeyError) as exc:
+        raise HTTPException(status_code=400, detail=f"Response catalog not reloaded: {exc}")
+    return {"reloaded": reloaded, "version": response_catalog.version}
+
+@app.get("/cache_stats")
+def cache_stats():
+    return {"report": report_cache.stats(), "analysis": analysis_cache.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint; covers this worker process only."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+class ProfilerSettings(BaseModel):
+    every: int  # profile one request in `every`; 0 turns profiling off
+    reset: bool = False
+
+@admin.post("/profiler")
+def configure_profiler(settings: ProfilerSettings):
+    if settings.every < 0:
+        raise HTTPException(status_code=400, detail="every must not be negative")
+    profiler.configure(settings.every)
+    if settings.reset:
+        profiler.reset()
+    return {"every": profiler.every, "profiled": profiler.profiled}
+
+@admin.get("/profiler")
+def profiler_report(limit: int = 30, sort: str = "cumulative"):
+    """Accumulated cProfile stats of the sampled requests, as text."""
+    try:
+        return PlainTextResponse(profiler.report(limit, sort))
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+
+if ADMIN_TOKEN:
+    app.include_router(admin)
+
+@app.get("/pool_stats")
+def pool_stats():
+    """Queue depth, rejections and queue wait times of the worker pool."""
+    return worker_pool.stats()
+
+# Module-level so they can also be shipped to a process pool
+def analyze_text(text: str):
+    return nlp.detect_intent(text), nlp.extract_entities(text), nlp.uses_ner(text)
+
+def analyze_texts(texts: List[str], batch_size: int, n_process: int):
+    results = nlp.analyze_batch(texts, batch_size=batch_size, n_process=n_process)
+    for text, result in zip(texts, results):
+        result["used_ner"] = nlp.uses_ner(text)
+    return results
+
+class BatchQuery(BaseModel):
+    queries: List[UserQuery]
+
+# spaCy batching for /analyze_query_batch
+NLP_BATCH_SIZE = int(os.environ.get("WELLORA_NLP_BATCH_SIZE", "64"))
+NLP_PROCESSES = int(os.environ.get("WELLORA_NLP_PROCESSES", "1"))
+
+# Intent and entities per folded query text (see fold_query), so repeated and lightly retyped
+# questions skip NLP; WELLORA_ANALYSIS_CACHE_SIZE=0 disables it. Queries are always analyzed as
+# typed. spaCy NER depends on case and punctuation, so texts it runs on are cached per exact
+# text instead: their folded key only holds NER_KEYED. Longer texts are analyzed but not cached.
+# Personalization is applied per request on top.
+ANALYSIS_CACHE_MAX_CHARS = 1000
+analysis_cache = LRUCache(max_size=int(os.environ.get("WELLORA_ANALYSIS_CACHE_SIZE", "10000")))
+NER_KEYED = object()
+
+def analysis_key(text: str):
+    # Results from before the spaCy model was ready lack NER, so they are kept apart
+    if len(text) > ANALYSIS_CACHE_MAX_CHARS:
+        return None
+    return fold_query(text), model_loader.status == "ready"
+
+def cached_analysis(text: str, key):
+    if not key:
+        return None
+    # Only the lookup that yields the analysis counts towards the hit ratio, not the marker probe
+    analysis = analysis_cache.get(key, count=False)
+    if analysis is NER_KEYED:
+        return analysis_cache.get(("ner", text.strip(), key[1]))
+    return analysis_cache.get(key)
+
+def cache_analysis(text: str, key, analysis, used_ner: bool) -> None:
+    if not key:
+        return
+    if used_ner:
+        analysis_cache.set(key, NER_KEYED)
+        analysis_cache.set(("ner", text.strip(), key[1]), analysis)
+    else:
+        analysis_cache.set(key, analysis)
+
 @app.post("/analyze_query")
 async def analyze_query(query: UserQuery):
-    intent = nlp.detect_intent(query.text)
-    entities = nlp.extract_entities(query.text)
-    
-    # Base response dictionary
-    responses = {
-        "dietary_advice": [
-            "A balanced diet is key. Try focusing on lean proteins like lentils or chicken, and complex carbohydrates like quinoa or sweet potatoes.",
-            "For optimal health, try to fill half your plate with colorful vegetables at every meal. It ensures a wide range of micronutrients.",
-            "Hydration is often confused with hunger. Make sure you're drinking enough water alongside your meals to support digestion.",
-            "If you're looking to improve your diet, cutting back on processed sugars and focusing on whole fruits is a great first step.",
-            "Incorporate healthy fats like avocado, nuts, and olive oil for better brain health and hormone regulation."
-        ],
-        "fitness_advice": [
-            "Consistency is more important than intensity. Find an activity you enjoy—be it swimming, dancing, or lifting—and stick with it.",
-            "Regular exercise, especially a mix of cardio and resistance training, can significantly boost your metabolic rate.",
-            "Don't forget to warm up! Dynamic stretching is essential for preventing injuries and preparing your body for a workout.",
-            "Ideally, aim for 150 minutes of moderate activity per week. Even three 10-minute walks a day can make a massive difference.",
-            "Try 'Zone 2' training (moderate intensity where you can still talk) to build a strong cardiovascular foundation."
-        ],
-        "sleep_advice": [
-            "Quality sleep starts with a consistent routine. Try to go to bed and wake up at the same time every day, even on weekends.",
-            "Avoid screens at least an hour before bed, as blue light can interfere with melatonin production.",
-            "Make sure your sleeping environment is cool (around 18°C), dark, and quiet for the deepest restorative rest.",
-            "If you're feeling tired during the day, a short 20-minute power nap before 3 PM can help recharge you without affecting night sleep.",
-            "Magnesium-rich foods or a warm bath before bed can help relax your muscles and prepare your body for sleep."
-        ],
-        "mental_health": [
-            "Taking time for yourself is not selfish, it's necessary. Try a 5-minute boxed breathing exercise (4-4-4-4) to calm your nervous system.",
-            "Mindfulness can help reduce stress. Even just focusing on your senses for a few minutes can lower cortisol levels.",
-            "If you're feeling overwhelmed, try 'brain dumping'—writing down every single thing on your mind for 5 minutes.",
-            "Don't underestimate the power of 'green time'—a short walk in nature has been shown to reduce rumination and anxiety.",
-            "Connect with a friend or loved one. Social connection is one of the strongest predictors of mental well-being."
-        ],
-        "hydration_advice": [
-            "Aim for about 2-3 liters of water a day, but listen to your body's thirst signals and adjust for activity level.",
-            "Eating fruits and vegetables with high water content, like cucumber, celery, or watermelon, is a delicious way to stay hydrated.",
-            "If you find plain water boring, try infusing it with lemon, ginger, or mint for added antioxidants.",
-            "Being well-hydrated improves skin elasticity, cognitive function, and helps your kidneys flush out toxins."
-        ],
-        "weight_advice": [
-            "Focus on non-scale victories like increased energy, better-fitting clothes, and improved strength rather than just the number on the scale.",
-            "Sustainable weight management comes from small, consistent changes. Focus on adding protein and fiber to every meal.",
-            "Muscle is denser than fat. If you're lifting weights, your weight might stay the same while your body composition improves.",
-            "A healthy and sustainable rate of weight loss is typically 0.5 to 1% of your body weight per week."
-        ],
-        "spiritual_health": [
-            "Connecting with your inner self through daily gratitude can shift your perspective from lack to abundance.",
-            "Spiritual wellness is about finding meaning. Take 10 minutes today to reflect on what truly matters to you.",
-            "Yoga is a beautiful bridge between the physical and spiritual. Even 15 minutes of Sun Salutations can ground your energy.",
-            "Deep, conscious breathing helps align your mind and body. Try inhaling peace and exhaling tension.",
-            "Spend time in silence. In the quiet, you can often find the answers you've been looking for."
-        ],
-        "general_health": [
-            "I'm here to support your holistic journey. Feel free to ask about nutrition, fitness, sleep, or spiritual wellness!",
-            "Small daily habits lead to big long-term results. What's one small, healthy choice you can make in the next hour?",
-            "Health is a holistic journey involving mind, body, and spirit. Treat yourself with kindness today.",
-            "Listening to your body's signals is the most important skill you can develop for long-term health and fitness."
-        ],
-        "pain_points": [
-            "If you're dealing with physical pain, remember to rest and consult a professional if it persists. Gentle yoga or stretching might help with minor back or neck tension.",
-            "Low energy often stems from a combination of dehydration, poor sleep, or lack of movement. Try a 10-minute walk and a glass of water.",
-            "Feeling stressed or anxious? Box breathing and 'grounding' (noticing 5 things you can see, 4 you can touch...) are powerful tools for instant relief.",
-            "For headaches, ensure you're not straining your eyes at a screen. A dark room and hydration are often the first steps to recovery.",
-            "If you're feeling bloated, try ginger tea or a light walk after your meal to aid digestion."
+    key = analysis_key(query.text)
+    with stage("analysis_cache"):
+        analysis = cached_analysis(query.text, key)
+    if analysis is None:
+        intent, entities, used_ner = await worker_pool.run(analyze_text, query.text)
+        analysis = intent, entities
+        cache_analysis(query.text, key, analysis, used_ner)
+    intent, entities = analysis
+    return build_query_response(intent, entities, query.user_id)
+
+@app.post("/analyze_query_batch")
+async def analyze_query_batch(batch: BatchQuery):
+    """Analyzes many queries at once; results come back in input order."""
+    texts = [query.text for query in batch.queries]
+    keys = [analysis_key(text) for text in texts]
+    with stage("analysis_cache"):
+        analyses = [cached_analysis(text, key) for text, key in zip(texts, keys)]
+    # Each distinct text that missed the cache is analyzed once
+    missing = {text: key for text, key, analysis in zip(texts, keys, analyses) if analysis is None}
+    if missing:
+        results = await worker_pool.run(analyze_texts, list(missing), NLP_BATCH_SIZE, NLP_PROCESSES)
+        computed = {}
+        for (text, key), result in zip(missing.items(), results):
+            computed[text] = result["intent"], result["entities"]
+            cache_analysis(text, key, computed[text], result["used_ner"])
+        analyses = [analysis or computed[text] for text, analysis in zip(texts, analyses)]
+    return {
+        "results": [
+            build_query_response(intent, entities, query.user_id)
+            for query, (intent, entities) in zip(batch.queries, analyses)
         ]
     }
 
-    # Select a base response
-    import random
-    base_response = random.choice(responses.get(intent, responses["general_health"]))
-    
-    # Personalize based on entities
-    personalized_note = ""
-    for ent in entities:
-        label = ent.get("label")
-        text = ent.get("text")
-        low_text = text.lower()
-        if label == "NUTRIENT":
-            personalized_note += f"\n\nFocusing on {text} is a great choice! It's essential for your body's recovery and energy levels."
-        elif label == "ACTIVITY":
-            personalized_note += f"\n\n{text.capitalize()} is a fantastic way to boost your mood and cardiovascular health!"
-        elif label == "PAIN_TYPE":
-            personalized_note += f"\n\nI'm sorry to hear about your {text}. Please take it slow and don't push through sharp pain."
-        elif label == "CARDINAL":
-            if intent == "dietary_advice":
-                personalized_note += f"\n\nTracking {text} units of your intake can help you stay on target with your goals."
-            elif intent == "fitness_advice":
-                personalized_note += f"\n\nAiming for {text} minutes is a solid plan. Consistency over intensity is the secret!"
-
-    # Personalize based on User History/State
-    user_context = ""
-    if query.user_id:
-        user_logs = [log for log in activity_logs if log.get("user_id") == query.user_id]
-        if user_logs:
-            last_activity = user_logs[-1]
-            if intent == "fitness_advice" and last_activity["activity_type"] == "workout":
-                user_context = f"\n\nI see you recently did a {last_activity['details']} workout. Keep up that momentum!"
-            elif intent == "dietary_advice" and last_activity["activity_type"] == "meal":
-                user_context = f"\n\nI noticed your last logged meal was {last_activity['details']}. Great job tracking your intake!"
-
-    final_response = base_response + personalized_note + user_context
-    
+def build_query_response(intent: str, entities: List[dict], user_id: Optional[str]):
+    last_activity = activity_store.latest(user_id) if user_id else None
+    with stage("compose_response"):
+        response = response_catalog.compose(intent, entities, last_activity)
     return {
         "intent": intent,
         "entities": entities,
-        "response": final_response
+        "response": response
     }
 
 @app.post("/generate_report")
 async def generate_report(data: HealthReportRequest):
-    bmi_category = recommender.calculate_bmi(data.weight, data.height)
+    key = report_fingerprint(data)
+    with stage("report_cache"):
+        report = await report_cache_io(report_cache.get, key)
+    if report is None:
+        report = await worker_pool.run(compute_report, data)
+        await report_cache_io(report_cache.set, key, report)
+    return report
+
+def report_fingerprint(data: HealthReportRequest) -> str:
+    # Bump "v" whenever compute_report changes its output; list order doesn't affect the report
+    return fingerprint({
+        "v": 2,
+        "age": data.age,
+        "weight": data.weight,
+        "height": data.height,
+        "activity_level": data.activity_level,
+        "dietary_preferences": sorted(set(data.dietary_preferences)),
+        "health_goals": sorted(set(data.health_goals)),
+    })
+
+async def report_cache_io(fn, *args):
+    # Redis round trips go to a thread; the in-process LRU runs inline
+    if report_cache.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+def compute_report(data: HealthReportRequest):
+    with stage("report"):
+        return _compute_report(data)
+
+def _compute_report(data: HealthReportRequest):
+    bmi = recommender.bmi(data.weight, data.height)
+    bmi_category = recommender.bmi_category(bmi)
     tdee = recommender.estimate_tdee(data.weight, data.height, data.age, data.activity_level)
     recommendations = recommender.generate_recommendations(bmi_category, tdee, data.health_goals)
-    charts_data = recommender.generate_chart_data(tdee)
+    charts_data = recommender.generate_chart_data(tdee, data.weight, data.height, data.age, data.activity_level)
     
     # Add dietary restrictions to recommendations
     if "vegan" in data.dietary_preferences:
-         recommendations.append("Ensure adequate B12 and Iron intake through fortified foods or supplements.")
+         recommendations.append(VEGAN_RECOMMENDATION)
          
     return {
-        "bmi": round(data.weight / ((data.height / 100) ** 2), 2),
+        "bmi": round(bmi, 2),
         "bmi_category": bmi_category,
         "daily_calories": round(tdee),
         "recommendations": recommendations,
         "charts": charts_data
     }
 
+@app.post("/weight_projection")
+async def weight_projection(data: WeightProjectionRequest):
+    """What-if projections of body weight for several calorie targets (a fan chart)."""
+    if not 0 < data.weeks <= MAX_PROJECTION_WEEKS:
+        raise HTTPException(status_code=400, detail=f"weeks must be between 1 and {MAX_PROJECTION_WEEKS}")
+    if not data.calorie_offsets or len(data.calorie_offsets) > 20:
+        raise HTTPException(status_code=400, detail="Provide between 1 and 20 calorie offsets")
+    scenarios = await worker_pool.run(
+        recommender.project_weight, data.weight, data.height, data.age, data.activity_level, data.calorie_offsets, data.weeks
+    )
+    return {"weeks": list(range(1, data.weeks + 1)), "scenarios": scenarios}
+
+@app.post("/generate_report_batch")
+def generate_report_batch(data: HealthReportBatchRequest):
+    """
+    Vectorized reports for many people at once, streamed back as NDJSON (one line
+    per input row, in input order). Recommendations are returned as codes.
+    """
+    size = len(data.age)
+    columns = [data.weight, data.height, data.activity_level, data.dietary_preferences, data.health_goals]
+    if any(column is not None and len(column) != size for column in columns):
+        raise HTTPException(status_code=400, detail="All columns must have the same length")
+    if data.chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+
+    def rows():
+        decoded = {}
+        for chunk in recommender.generate_reports_batch(
+            data.age, data.weight, data.height, data.activity_level,
+            health_goals=data.health_goals, dietary_preferences=data.dietary_preferences,
+            chunk_size=data.chunk_size,
+        ):
+            lines = []
+            for bmi, category, calories, mask in zip(
+                chunk["bmi"].tolist(), chunk["bmi_category"].tolist(),
+                chunk["daily_calories"].tolist(), chunk["recommendations"].tolist(),
+            ):
+                if mask not in decoded:
+                    decoded[mask] = decode_recommendations(mask)
+                lines.append(json.dumps({
+                    "bmi": bmi, "bmi_category": category, "daily_calories": calories, "recommendations": decoded[mask]
+                }))
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 class ActivityLog(BaseModel):
     user_id: Optional[str] = "default_user"
     activity_type: str # 'meal' or 'workout'
     details: str
-    value: float # calories or duration (minutes)
+    value: float = Field(allow_inf_nan=False) # calories or duration (minutes)
+
+    # JSON escapes can carry lone surrogates, which no storage backend can encode
+    @field_validator("user_id", "activity_type", "details")
+    @classmethod
+    def encodable(cls, text: Optional[str]) -> Optional[str]:
+        if text is not None:
+            try:
+                text.encode("utf-8")
+            except UnicodeEncodeError:
+                raise ValueError("must be valid Unicode text") from None
+        return text
+
+# Activity logs are persisted by a storage backend (WELLORA_STORAGE: memory, sqlite or segment)
+# and served from an in-memory index partitioned per user. With sqlite every worker polls the
+# database for its peers' writes (WELLORA_STORAGE_POLL seconds); segment allows a single worker.
+DATA_DIR = os.environ.get("WELLORA_DATA_DIR", "var")
+storage = open_backend(os.environ.get("WELLORA_STORAGE", "memory"), DATA_DIR)
+activity_store = ActivityStore()
+
+REGISTRY.gauge("wellora_activity_logs", "Activity logs in the in-memory index.", lambda: len(activity_store))
+REGISTRY.gauge("wellora_activity_users", "Users with at least one activity log.", lambda: len(activity_store.users()))
+REGISTRY.gauge("wellora_pool_in_flight", "Tasks running or queued in the worker pool.", lambda: worker_pool.in_flight)
+REGISTRY.gauge("wellora_pool_queue_depth", "Tasks waiting for a worker.", lambda: worker_pool.queue_depth)
+REGISTRY.gauge("wellora_pool_rejected_total", "Tasks rejected because the pool queue was full.", lambda: worker_pool.rejected, kind="counter")
+REGISTRY.gauge("wellora_nlp_model_ready", "1 once the spaCy model is loaded.", lambda: int(model_loader.status == "ready"))
+REGISTRY.gauge("wellora_report_cache_hits_total", "Report cache hits.", lambda: report_cache.hits, kind="counter")
+REGISTRY.gauge("wellora_report_cache_misses_total", "Report cache misses.", lambda: report_cache.misses, kind="counter")
+REGISTRY.gauge("wellora_analysis_cache_hits_total", "Query analysis cache hits.", lambda: analysis_cache.hits, kind="counter")
+REGISTRY.gauge("wellora_analysis_cache_misses_total", "Query analysis cache misses.", lambda: analysis_cache.misses, kind="counter")
 
-# In-memory storage for activity logs (in production, use a database)
-activity_logs = [
-    {"user_id": "default_user", "activity_type": "workout", "details": "Jogging", "value": 30, "timestamp": datetime.now() - timedelta(days=2)},
-    {"user_id": "default_user", "activity_type": "workout", "details": "Yoga", "value": 45, "timestamp": datetime.now() - timedelta(days=1)},
-    {"user_id": "default_user", "activity_type": "workout", "details": "Gym", "value": 60, "timestamp": datetime.now()},
-]
+if isinstance(storage, MemoryBackend):
+    # Demo data for the non-persistent default
+    seed_logs = [
+        {"user_id": "default_user", "activity_type": "workout", "details": "Jogging", "value": 30, "timestamp": datetime.now() - timedelta(days=2)},
+        {"user_id": "default_user", "activity_type": "workout", "details": "Yoga", "value": 45, "timestamp": datetime.now() - timedelta(days=1)},
+        {"user_id": "default_user", "activity_type": "workout", "details": "Gym", "value": 60, "timestamp": datetime.now()},
+    ]
+    for log, log_id in zip(seed_logs, storage.submit(seed_logs).result()):
+        log["id"] = log_id
+        activity_store.append(log)
 
 @app.post("/log_activity")
 async def log_activity(log: ActivityLog):
-    # Store the activity log
-    activity_logs.append({
+    # Store the activity log; it becomes visible once the backend has committed it
+    entry = {
         "user_id": log.user_id,
         "activity_type": log.activity_type,
         "details": log.details,
         "value": log.value,
         "timestamp": datetime.now()  # Store actual timestamp
-    })
+    }
+    with stage("storage_commit"):
+        entry["id"] = (await asyncio.wrap_future(storage.submit([entry])))[0]
+    activity_store.append(entry)
     
     unit = "kcal" if log.activity_type == 'meal' else "minutes"
     message = f"Successfully logged {log.activity_type}: {log.details} ({log.value} {unit})"
@@ -202,6 +482,270 @@ async def log_activity(log: ActivityLog):
         
     return {"status": "success", "message": message}
 
+class BulkActivityLog(ActivityLog):
+    # Imported entries carry when the activity happened; missing means "now"
+    timestamp: Optional[datetime] = None
+
+BULK_FORMATS = ("ndjson", "csv")
+BULK_BATCH_SIZE = int(os.environ.get("WELLORA_BULK_BATCH_SIZE", "1000"))
+MAX_BULK_LINE_BYTES = 64 * 1024
+MAX_BULK_ERRORS = 1000
+
+async def read_body_lines(request: Request):
+    """
+    Yields the request body line by line as it streams in, holding at most one
+    partial line. A line longer than MAX_BULK_LINE_BYTES is dropped and yielded as None.
+    """
+    pending = b""
+    oversized = False
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield None if oversized or len(line) > MAX_BULK_LINE_BYTES else line.rstrip(b"\r")
+            oversized = False
+        if len(pending) > MAX_BULK_LINE_BYTES:
+            pending, oversized = b"", True
+    if pending or oversized:
+        yield None if oversized else pending.rstrip(b"\r")
+
+def to_server_time(value: datetime) -> datetime:
+    """The index keeps naive server-local timestamps, like /log_activity; aware ones are converted."""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+def describe_error(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in exc.errors())
+    return str(exc)
+
+def parse_bulk_lines(lines: List[Optional[bytes]], fmt: str, columns: Optional[List[str]], first_line_no: int):
+    """Validates one batch of upload lines; returns (entries, errors). Blank lines are skipped."""
+    with stage("bulk_parse"):
+        return _parse_bulk_lines(lines, fmt, columns, first_line_no)
+
+def _parse_bulk_lines(lines: List[Optional[bytes]], fmt: str, columns: Optional[List[str]], first_line_no: int):
+    entries, errors = [], []
+    now = datetime.now()
+    for line_no, line in enumerate(lines, first_line_no):
+        if line is not None and not line.strip():
+            continue
+        try:
+            if line is None:
+                raise ValueError(f"line is longer than {MAX_BULK_LINE_BYTES} bytes")
+            text = line.decode("utf-8")
+            if fmt == "csv":
+                values = next(csv.reader([text]))
+                if len(values) != len(columns):
+                    raise ValueError(f"expected {len(columns)} fields, got {len(values)}")
+                record = {column: value for column, value in zip(columns, values) if value != ""}
+            else:
+                record = json.loads(text)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            log = BulkActivityLog(**record)
+        except ValueError as exc:  # also covers decoding, JSON and validation errors
+            errors.append({"line": line_no, "error": describe_error(exc)})
+            continue
+
+        timestamp = to_server_time(log.timestamp) if log.timestamp else now
+        entries.append({
+            "user_id": log.user_id,
+            "activity_type": log.activity_type,
+            "details": log.details,
+            "value": log.value,
+            "timestamp": timestamp,
+        })
+    return entries, errors
+
+async def ingest_bulk_batch(lines: List[Optional[bytes]], fmt: str, columns: Optional[List[str]], first_line_no: int):
+    try:
+        entries, errors = await worker_pool.run(parse_bulk_lines, lines, fmt, columns, first_line_no)
+    except PoolBusyError:
+        # Earlier batches are already committed, so a full pool must not fail the upload halfway
+        entries, errors = parse_bulk_lines(lines, fmt, columns, first_line_no)
+    if entries:
+        with stage("storage_commit"):
+            ids = await asyncio.wrap_future(storage.submit(entries))
+        for entry, log_id in zip(entries, ids):
+            entry["id"] = log_id
+        # Off the event loop: merging into large partitions and updating aggregates is CPU work.
+        # Not the worker pool, which may be a process pool and could not reach the store
+        await asyncio.to_thread(activity_store.extend, entries)
+    return len(entries), errors
+
+BULK_CSV_COLUMNS = ("user_id", "activity_type", "details", "value", "timestamp")
+BULK_CSV_REQUIRED = ("user_id", "activity_type", "details", "value")
+
+def check_bulk_columns(columns: List[str]) -> None:
+    # A misspelled column would otherwise be ignored and every row filed under the defaults
+    unknown = [column for column in columns if column not in BULK_CSV_COLUMNS]
+    missing = [column for column in BULK_CSV_REQUIRED if column not in columns]
+    if unknown or missing or len(set(columns)) != len(columns):
+        problems = [f"unknown columns: {', '.join(unknown)}"] if unknown else []
+        problems += [f"missing columns: {', '.join(missing)}"] if missing else []
+        problems += [] if problems else ["duplicate columns"]
+        raise HTTPException(status_code=400, detail=f"Invalid CSV header ({'; '.join(problems)}); "
+                                                    f"expected {','.join(BULK_CSV_COLUMNS)}")
+
+@app.post("/log_activities/bulk")
+async def log_activities_bulk(request: Request, format: Optional[str] = None):
+    """
+    Imports many activity logs from an NDJSON or CSV (header row first) request body,
+    picked by `format` or the Content-Type. The upload is validated and committed in
+    batches of WELLORA_BULK_BATCH_SIZE lines as it streams in; invalid lines are
+    skipped and reported by line number (the first MAX_BULK_ERRORS of them).
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in BULK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(BULK_FORMATS)}")
+
+    accepted = rejected = 0
+    errors = []
+    columns = None
+    batch = []
+    line_no = batch_start = 0
+    async for line in read_body_lines(request):
+        line_no += 1
+        if fmt == "csv" and columns is None:
+            if line is not None and not line.strip():
+                continue
+            try:
+                # utf-8-sig: spreadsheet exports start with a byte order mark
+                columns = next(csv.reader([line.decode("utf-8-sig")]))
+            except (AttributeError, UnicodeDecodeError):
+                raise HTTPException(status_code=400, detail="Unreadable CSV header row")
+            check_bulk_columns(columns)
+            continue
+        if not batch:
+            batch_start = line_no
+        batch.append(line)
+        if len(batch) < BULK_BATCH_SIZE:
+            continue
+        count, batch_errors = await ingest_bulk_batch(batch, fmt, columns, batch_start)
+        accepted += count
+        rejected += len(batch_errors)
+        errors.extend(batch_errors[:MAX_BULK_ERRORS - len(errors)])
+        batch = []
+    if batch:
+        count, batch_errors = await ingest_bulk_batch(batch, fmt, columns, batch_start)
+        accepted += count
+        rejected += len(batch_errors)
+        errors.extend(batch_errors[:MAX_BULK_ERRORS - len(errors)])
+
+    return {
+        "status": "success" if not rejected else "partial",
+        "accepted": accepted,
+        "rejected": rejected,
+        "errors": errors,
+        "errors_truncated": rejected > len(errors),
+    }
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_COLUMNS = ["id", "user_id", "activity_type", "details", "value", "timestamp"]
+EXPORT_CHUNK_ROWS = 1000
+MAX_PAGE_SIZE = 1000
+
+def serialize_log(entry: dict) -> dict:
+    return {
+        "id": entry["id"],
+        "user_id": entry["user_id"],
+        "activity_type": entry["activity_type"],
+        "details": entry["details"],
+        "value": entry["value"],
+        "timestamp": entry["timestamp"].isoformat(),
+    }
+
+def encode_cursor(entry: dict) -> str:
+    key = f"{entry['timestamp'].isoformat()}|{entry['id']}"
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except ValueError:  # also covers bad base64 and non-UTF-8 bytes
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def scan_logs(user_id: Optional[str], activity_type: Optional[str], start: Optional[datetime], end: Optional[datetime], after=None):
+    return activity_store.scan(
+        None if user_id is None else [user_id],
+        start=to_server_time(start) if start else None,
+        end=to_server_time(end) if end else None,
+        activity_type=activity_type,
+        after=after,
+    )
+
+@app.get("/activity_logs")
+async def list_activity_logs(
+    user_id: Optional[str] = None,
+    activity_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+):
+    """
+    Raw activity logs with start <= timestamp < end, oldest first, for one user or
+    everyone. Pages are keyed by (timestamp, id): pass `next_cursor` back as `cursor`
+    to continue; it is None on the last page.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    after = decode_cursor(cursor) if cursor else None
+    with stage("activity_scan"):
+        page = list(itertools.islice(scan_logs(user_id, activity_type, start, end, after), limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        "logs": [serialize_log(entry) for entry in page],
+        "next_cursor": encode_cursor(page[-1]) if has_more else None,
+    }
+
+async def export_chunks(rows, fmt: str):
+    """Formats rows EXPORT_CHUNK_ROWS at a time, yielding to the event loop between chunks."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+    while True:
+        chunk = list(itertools.islice(rows, EXPORT_CHUNK_ROWS))
+        if not chunk:
+            break
+        if fmt == "csv":
+            writer.writerows(
+                [entry["id"], entry["user_id"], entry["activity_type"], entry["details"], entry["value"], entry["timestamp"].isoformat()]
+                for entry in chunk
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            yield "".join(json.dumps(serialize_log(entry)) + "\n" for entry in chunk)
+        await asyncio.sleep(0)
+    if fmt == "csv" and buffer.tell():
+        yield buffer.getvalue()
+
+@app.get("/activity_logs/export")
+async def export_activity_logs(
+    format: str = "ndjson",
+    user_id: Optional[str] = None,
+    activity_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """
+    Streams every matching log as NDJSON or CSV, in the same order as /activity_logs.
+    Rows are read from the store lazily, so memory does not grow with the export size.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_chunks(scan_logs(user_id, activity_type, start, end), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="activity_logs.{format}"'},
+    )
+
 class HealthScoreRequest(BaseModel):
     age: Optional[int] = None
     weight: Optional[float] = None
@@ -216,6 +760,7 @@ async def calculate_health_score(data: HealthScoreRequest):
     - BMI category (30 points)
     - Activity engagement (30 points)
     - Consistency (20 points)
+    Activity figures come from per-user running aggregates, not from raw logs.
     """
     score = 0
     feedback = []
@@ -257,18 +802,26 @@ async def calculate_health_score(data: HealthScoreRequest):
     score += bmi_score
     
     # 3. Activity Engagement (30 points)
-    user_activities = [log for log in activity_logs if log.get("user_id") == data.user_id]
-    activity_score = min(len(user_activities) * 5, 30)  # 5 points per activity, max 30
+    activity_count = activity_store.count(data.user_id)
+    activity_score = min(activity_count * 5, 30)  # 5 points per activity, max 30
     score += activity_score
     
     if activity_score < 15:
         feedback.append("Log more meals and workouts to boost your score!")
     
-    # 4. Consistency Bonus (20 points)
-    # For now, give partial points based on activity count
-    consistency_score = min(len(user_activities) * 3, 20)
+    # 4. Consistency (20 points): current streak (up to a week) and active days in the last 30
+    today = datetime.now().date()
+    aggregates = activity_store.aggregates(data.user_id)
+    with stage("health_aggregates"):
+        streak = aggregates.current_streak(today) if aggregates else 0
+        last_7 = aggregates.rolling(7, today) if aggregates else {"active_days": 0, "sums": {}}
+        last_30 = aggregates.rolling(30, today) if aggregates else {"active_days": 0, "sums": {}}
+    consistency_score = round(min(streak, 7) / 7 * 10 + min(last_30["active_days"], 15) / 15 * 10)
     score += consistency_score
     
+    if streak == 0:
+        feedback.append("Log an activity today to start a new streak!")
+    
     # Determine overall label
     if score >= 80:
         label = "Excellent"
@@ -293,32 +846,73 @@ async def calculate_health_score(data: HealthScoreRequest):
             "bmi": bmi_score,
             "activity": activity_score,
             "consistency": consistency_score
+        },
+        "stats": {
+            "activity_counts": dict(aggregates.counts) if aggregates else {},
+            "active_days": aggregates.active_days if aggregates else 0,
+            "current_streak": streak,
+            "last_7_days": last_7,
+            "last_30_days": last_30
         }
     }
 
+HISTORY_GRANULARITIES = ("day", "week", "month")
+MAX_HISTORY_DAYS = 3660
+
 @app.get("/activity_history")
-async def get_activity_history(user_id: str = "default_user"):
-    # Initialize 7 days with 0
-    now = datetime.now()
-    # Find the Monday of the current week
-    monday = now - timedelta(days=now.weekday())
-    monday = monday.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    daily_values = [0] * 7
-    labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    
-    for log in activity_logs:
-        if log.get("user_id") == user_id and log.get("activity_type") == "workout":
-            log_time = log.get("timestamp")
-            if isinstance(log_time, datetime):
-                # Check if it's within the current week
-                if log_time >= monday:
-                    day_idx = log_time.weekday()
-                    daily_values[day_idx] += log.get("value", 0)
+async def get_activity_history(
+    user_id: str = "default_user",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
+    tz: Optional[str] = None,
+    activity_type: str = "workout",
+):
+    """
+    Summed activity values per day, week or month between start and end (inclusive),
+    served from the per-user day index. Without start/end it returns the current
+    week (Mon-Sun) by day. Dates are in the `tz` timezone (server-local by default);
+    activity_type=all sums every type.
+    """
+    if granularity not in HISTORY_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(HISTORY_GRANULARITIES)}")
+    try:
+        zone = ZoneInfo(tz) if tz else None
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {tz}")
+
+    today = datetime.now(zone).date()
+    current_week = start is None and end is None
+    if current_week:
+        # Find the Monday of the current week
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=6)
+    else:
+        end = end or today
+        start = start or end - timedelta(days=6)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= MAX_HISTORY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_HISTORY_DAYS} days")
+
+    with stage("history_buckets"):
+        series = bucket_series(
+            activity_store.day_buckets(user_id, zone), start, end, granularity,
+            None if activity_type == "all" else activity_type,
+        )
+    if current_week and granularity == "day":
+        labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    elif granularity == "month":
+        labels = [bucket.strftime("%Y-%m") for bucket, _ in series]
+    else:
+        labels = [bucket.isoformat() for bucket, _ in series]
     
     return {
         "labels": labels,
-        "data": daily_values
+        "data": [value for _, value in series],
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "granularity": granularity
     }
 
 if __name__ == "__main__":
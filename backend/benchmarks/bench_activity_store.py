@@ -0,0 +1,65 @@
+"""Latency of the store-backed endpoints as the activity store grows.
+
+Usage: python benchmarks/bench_activity_store.py [--sizes 1000,100000,10000000] [--users 100000]
+
+Ten million logs need several GB of RAM; the default sizes stop at one million.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from common import format_row, summarize, time_calls  # also puts the backend on sys.path
+
+import app
+from activity_store import ActivityStore
+
+
+def build_store(size: int, users: int, seed: int = 7) -> ActivityStore:
+    rng = random.Random(seed)
+    store = ActivityStore()
+    start = datetime.now() - timedelta(days=60)
+    step = timedelta(days=60) / max(size, 1)
+    for i in range(size):
+        activity_type = "workout" if rng.random() < 0.5 else "meal"
+        store.append({
+            "user_id": f"user_{rng.randrange(users)}",
+            "activity_type": activity_type,
+            "details": "Running" if activity_type == "workout" else "Salad",
+            "value": rng.randint(10, 900),
+            "timestamp": start + step * i,
+        })
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    rng = random.Random(11)
+    for size in (int(s) for s in args.sizes.split(",")):
+        users = min(args.users, size)
+        app.activity_store = build_store(size, users)
+
+        def user_id():
+            return f"user_{rng.randrange(users)}"
+
+        cases = {
+            "/analyze_query": lambda: loop.run_until_complete(app.analyze_query(
+                app.UserQuery(text="What should I eat after my workout?", user_id=user_id()))),
+            "/calculate_health_score": lambda: loop.run_until_complete(app.calculate_health_score(
+                app.HealthScoreRequest(age=30, weight=70, height=175, user_id=user_id()))),
+            "/activity_history": lambda: loop.run_until_complete(
+                app.get_activity_history(user_id=user_id())),
+        }
+        print(f"== {size:,} logs across {users:,} users")
+        for name, call in cases.items():
+            print(format_row(name, summarize(time_calls(call, args.repeat))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""CPU per /analyze_query request with and without the query analysis cache.
+
+Usage: python benchmarks/bench_analysis_cache.py [--requests 20000] [--distinct 2000] [--zipf 1.1]
+
+Builds a repeated-query corpus: --distinct questions (see synthetic.py)
+asked with Zipf-distributed popularity, each time with random case,
+spacing and punctuation, as users retype them. Sends it through the ASGI
+app in-process with NLP inline and reports CPU time per request and the
+hit ratio, first with the cache disabled and then enabled, after checking
+that both return the same intents and entities.
+
+spaCy is loaded if WELLORA_SPACY_MODEL (default en_core_web_sm) is
+available; WELLORA_NER_MODE=always makes every miss run it.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("WELLORA_STORAGE", "memory")
+os.environ.setdefault("WELLORA_RESPONSE_SEED", "0")
+os.environ.setdefault("WELLORA_POOL_WORKERS", "0")
+os.environ.setdefault("WELLORA_SPACY_LOAD", "lazy")
+
+from common import asgi_request  # also puts the backend on sys.path
+from synthetic import make_queries
+
+import app
+import nlp_utils
+from cache import LRUCache
+
+
+def retype(text: str, rng: random.Random) -> str:
+    """The same question as a user might type it again."""
+    words = text.rstrip("?.!").split()
+    if rng.random() < 0.3:
+        words = [word.upper() if rng.random() < 0.2 else word.capitalize() for word in words]
+    elif rng.random() < 0.5:
+        words = [word.lower() for word in words]
+    separator = "  " if rng.random() < 0.1 else " "
+    return separator.join(words) + rng.choice(["", "?", "??", ".", "!", " ?"])
+
+
+def make_corpus(requests: int, distinct: int, zipf: float, seed: int = 11):
+    rng = random.Random(seed)
+    corpora = make_queries(app.nlp.intents, distinct // len(app.nlp.intents) + 1, rng)
+    questions = [text for corpus in corpora.values() for text in corpus][:distinct]
+    rng.shuffle(questions)
+    weights = [1 / rank ** zipf for rank in range(1, len(questions) + 1)]
+    return [retype(text, rng) for text in rng.choices(questions, weights, k=requests)]
+
+
+async def run(corpus) -> float:
+    """CPU seconds to serve the corpus."""
+    for text in corpus[:100]:
+        await asgi_request(app.app, "POST", "/analyze_query", {"text": text, "user_id": "default_user"})
+    started = time.process_time()
+    for text in corpus:
+        await asgi_request(app.app, "POST", "/analyze_query", {"text": text, "user_id": "default_user"})
+    return time.process_time() - started
+
+
+def analyses(corpus):
+    return [asyncio.run(app.analyze_query(app.UserQuery(text=text))) for text in corpus]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=2000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    nlp_utils.model_loader.load()
+    print(f"spaCy model loaded: {nlp_utils.nlp is not None}, ner_mode={app.nlp.ner_mode}")
+    corpus = make_corpus(args.requests, args.distinct, args.zipf)
+    print(f"{len(corpus):,} requests, {len(set(corpus)):,} distinct texts, "
+          f"{len({nlp_utils.fold_query(text) for text in corpus}):,} after folding")
+
+    app.analysis_cache = LRUCache(max_size=0)
+    uncached = [(r["intent"], r["entities"]) for r in analyses(corpus[:2000])]
+    app.analysis_cache = LRUCache(max_size=args.cache_size)
+    cached = [(r["intent"], r["entities"]) for r in analyses(corpus[:2000])]
+    assert cached == uncached, "cached analyses differ from fresh ones"
+    print(f"cached and fresh analyses match on the first {len(cached):,} requests")
+
+    app.analysis_cache = LRUCache(max_size=0)
+    baseline = asyncio.run(run(corpus))
+    app.analysis_cache = LRUCache(max_size=args.cache_size)
+    with_cache = asyncio.run(run(corpus))
+    stats = app.analysis_cache.stats()
+    print(f"no cache    {baseline / len(corpus) * 1e6:8.1f} us CPU/request")
+    print(f"with cache  {with_cache / len(corpus) * 1e6:8.1f} us CPU/request  "
+          f"({(with_cache / baseline - 1) * 100:+.1f}%, hit ratio {stats['hit_ratio']:.1%}, {stats['size']:,} entries)")
+
+
+if __name__ == "__main__":
+    main()
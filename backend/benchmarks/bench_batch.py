@@ -0,0 +1,52 @@
+"""Throughput of /analyze_query_batch vs. the same queries sent one by one.
+
+Usage: python benchmarks/bench_batch.py [--queries 5000] [--batch 256]
+                                        [--batch-size 64] [--n-process 1] [--ner-mode always]
+
+The handlers are called in-process so only the analysis cost is compared.
+Without en_core_web_sm the difference is limited to per-call overhead.
+"""
+import argparse
+import asyncio
+import time
+
+from common import BACKEND_DIR  # noqa: F401  (puts the backend on sys.path)
+
+import app
+import nlp_utils
+from nlp_utils import SimpleNLP
+from bench_intent import make_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=256, help="queries per /analyze_query_batch request")
+    parser.add_argument("--batch-size", type=int, default=64, help="nlp.pipe batch_size")
+    parser.add_argument("--n-process", type=int, default=1, help="nlp.pipe n_process")
+    parser.add_argument("--ner-mode", default="always", choices=["fallback", "always", "never"])
+    args = parser.parse_args()
+
+    nlp_utils.model_loader.load()
+    app.nlp = SimpleNLP(ner_mode=args.ner_mode)
+    app.NLP_BATCH_SIZE, app.NLP_PROCESSES = args.batch_size, args.n_process
+    queries = [app.UserQuery(text=text, user_id="default_user") for text in make_corpus(app.nlp.intents, args.queries)]
+    print(f"spaCy model loaded: {nlp_utils.nlp is not None}, ner_mode={args.ner_mode}")
+
+    async def one_by_one():
+        for query in queries:
+            await app.analyze_query(query)
+
+    async def batched():
+        for i in range(0, len(queries), args.batch):
+            await app.analyze_query_batch(app.BatchQuery(queries=queries[i:i + args.batch]))
+
+    for name, run in (("separate /analyze_query", one_by_one), (f"/analyze_query_batch x{args.batch}", batched)):
+        started = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        print(f"{name:<32} {len(queries) / elapsed:12,.0f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
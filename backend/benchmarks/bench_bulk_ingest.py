@@ -0,0 +1,121 @@
+"""Throughput and server memory of /log_activities/bulk for a large streamed upload.
+
+Usage: python benchmarks/bench_bulk_ingest.py [--size-mb 1024] [--format ndjson|csv]
+                                               [--users 1000] [--storage memory]
+
+Starts a uvicorn server, streams a generated upload of --size-mb megabytes
+to /log_activities/bulk and reports entries/sec and the server's peak RSS
+(VmHWM, Linux only). The upload is generated on the fly, so the client
+never holds it either. Every accepted entry is kept in the in-memory index,
+so RSS grows with the entry count; the per-entry growth it prints should
+stay flat as --size-mb grows, which shows the upload itself is never
+buffered. Requires httpx.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from common import BACKEND_DIR
+from load_event_loop import free_port
+
+CHUNK_BYTES = 256 * 1024
+ACTIVITIES = [("meal", "Salad", 350), ("meal", "Pasta", 800), ("workout", "Run", 30), ("workout", "Yoga", 45)]
+
+
+def generate(size_bytes: int, fmt: str, users: int, stats: dict):
+    """Yields upload chunks until size_bytes have been produced; counts lines in stats."""
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1)
+    produced = 0
+    lines = []
+    if fmt == "csv":
+        lines.append("user_id,activity_type,details,value,timestamp")
+    while produced < size_bytes:
+        for _ in range(1000):
+            activity_type, details, value = rng.choice(ACTIVITIES)
+            user_id = f"user{rng.randrange(users)}"
+            timestamp = (start + timedelta(minutes=rng.randrange(600_000))).isoformat()
+            if fmt == "csv":
+                lines.append(f"{user_id},{activity_type},{details},{value},{timestamp}")
+            else:
+                lines.append(json.dumps({
+                    "user_id": user_id, "activity_type": activity_type, "details": details,
+                    "value": value, "timestamp": timestamp,
+                }))
+        chunk = ("\n".join(lines) + "\n").encode()
+        stats["lines"] += len(lines)
+        lines = []
+        for i in range(0, len(chunk), CHUNK_BYTES):
+            yield chunk[i:i + CHUNK_BYTES]
+        produced += len(chunk)
+    stats["bytes"] = produced
+
+
+def rss_kb(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=1024)
+    parser.add_argument("--format", default="ndjson", choices=["ndjson", "csv"])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--storage", default="memory", choices=["memory", "sqlite", "segment"])
+    args = parser.parse_args()
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, WELLORA_STORAGE=args.storage, WELLORA_DATA_DIR=data_dir)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+                for _ in range(200):
+                    try:
+                        client.get("/")
+                        break
+                    except httpx.TransportError:
+                        time.sleep(0.05)
+                idle_kb = rss_kb(server.pid, "VmRSS")
+
+                stats = {"lines": 0, "bytes": 0}
+                content_type = "text/csv" if args.format == "csv" else "application/x-ndjson"
+                started = time.perf_counter()
+                response = client.post(
+                    "/log_activities/bulk",
+                    content=generate(int(args.size_mb * 1024 * 1024), args.format, args.users, stats),
+                    headers={"content-type": content_type},
+                )
+                elapsed = time.perf_counter() - started
+                peak_kb = rss_kb(server.pid, "VmHWM")
+                result = response.json()
+        finally:
+            server.terminate()
+            server.wait()
+
+    accepted = result["accepted"]
+    print(f"uploaded {stats['bytes'] / 2**20:,.0f} MB ({args.format}, {args.storage} storage) in {elapsed:.1f}s")
+    print(f"accepted={accepted:,} rejected={result['rejected']:,}  {accepted / elapsed:,.0f} entries/s")
+    print(f"server RSS idle={idle_kb / 1024:,.0f} MB  peak={peak_kb / 1024:,.0f} MB  "
+          f"growth per accepted entry={(peak_kb - idle_kb) * 1024 / max(accepted, 1):,.0f} B")
+
+
+if __name__ == "__main__":
+    main()
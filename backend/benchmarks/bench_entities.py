@@ -0,0 +1,69 @@
+"""Single-pass entity extraction vs. the original implementation, with and without spaCy.
+
+Usage: python benchmarks/bench_entities.py [--queries 5000]
+
+The spaCy rows are only reported when en_core_web_sm is installed.
+"""
+import argparse
+import re
+
+from common import format_row, summarize, time_calls  # also puts the backend on sys.path
+
+import nlp_utils
+from nlp_utils import SimpleNLP
+from bench_intent import make_corpus
+
+
+def legacy_extract_entities(model, text):
+    """The original implementation: spaCy on every call plus one search per keyword."""
+    entities = []
+    if model:
+        for ent in model(text).ents:
+            entities.append({"label": ent.label_, "text": ent.text})
+    if "protein" in text.lower():
+        entities.append({"label": "NUTRIENT", "text": "protein"})
+    if "cardio" in text.lower():
+        entities.append({"label": "ACTIVITY", "text": "cardio"})
+    for kw in ["headache", "backache", "back pain", "neck pain", "sore", "bloated", "cramp", "ach", "stress", "anxiety"]:
+        if kw in text.lower():
+            entities.append({"label": "PAIN_TYPE", "text": kw})
+    for num in re.findall(r'\d+', text):
+        entities.append({"label": "CARDINAL", "text": num})
+    return entities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = SimpleNLP()
+    corpus = make_corpus(engine.intents, args.queries)
+    corpus = [f"{text} {i % 90} minutes" if i % 3 == 0 else text for i, text in enumerate(corpus)]
+    nlp_utils.model_loader.load()
+    model = nlp_utils.nlp
+
+    def per_query(fn):
+        iterator = iter(corpus * 2)
+        return lambda: fn(next(iterator))
+
+    try:
+        nlp_utils.nlp = None
+        print("-- without en_core_web_sm")
+        print(format_row("original", summarize(time_calls(per_query(lambda t: legacy_extract_entities(None, t)), len(corpus)))))
+        print(format_row("single pass", summarize(time_calls(per_query(engine.extract_entities), len(corpus)))))
+    finally:
+        nlp_utils.nlp = model
+
+    if model is None:
+        print("-- en_core_web_sm is not installed; skipping the spaCy comparison")
+        return
+    print("-- with en_core_web_sm")
+    print(format_row("original", summarize(time_calls(per_query(lambda t: legacy_extract_entities(model, t)), len(corpus)))))
+    for mode in ("fallback", "always"):
+        ner_engine = SimpleNLP(ner_mode=mode)
+        print(format_row(f"single pass (ner_mode={mode})", summarize(time_calls(per_query(ner_engine.extract_entities), len(corpus)))))
+
+
+if __name__ == "__main__":
+    main()
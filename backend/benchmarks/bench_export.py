@@ -0,0 +1,112 @@
+"""Throughput and memory of the streaming activity log export.
+
+Usage: python benchmarks/bench_export.py [--rows 10000000] [--users 10000] [--formats ndjson,csv]
+                                         [--distribution pareto|uniform]
+
+Fills the app's in-memory store with --rows logs, spread over --users
+either skewed (pareto: one very active user, many light ones) or evenly
+(uniform). Then times the first /activity_logs page across all users and
+drains /activity_logs/export's generator for the whole user base and for
+the most active user, without HTTP. Memory is the largest RSS growth seen
+(Linux only). Both should stay flat whatever --rows and --users are;
+uniform with many users (e.g. --users 100000) is the case to check for
+the latter. The store itself needs roughly 700 B per row, so 10M rows
+need ~7 GB.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ["WELLORA_STORAGE"] = "memory"
+
+from common import BACKEND_DIR  # also puts the backend on sys.path
+
+import app
+from activity_store import ActivityStore
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def build_store(rows: int, users: int, distribution: str = "pareto", seed: int = 5) -> ActivityStore:
+    rng = random.Random(seed)
+    store = ActivityStore()
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=365) / max(rows, 1)
+    batch = []
+    for i in range(rows):
+        if distribution == "pareto":
+            # Skewed towards low user numbers so one user is very active
+            user = min(int(rng.paretovariate(1.2)) - 1, users - 1)
+        else:
+            user = rng.randrange(users)
+        batch.append({
+            "id": i + 1,
+            "user_id": f"user{user}",
+            "activity_type": "workout" if i % 2 else "meal",
+            "details": "Running" if i % 2 else "Salad",
+            "value": 30 + i % 500,
+            "timestamp": start + step * i,
+        })
+        if len(batch) == 100_000:
+            store.extend(batch)
+            batch = []
+    store.extend(batch)
+    return store
+
+
+async def drain(rows, fmt: str) -> dict:
+    baseline = peak = rss_kb()
+    count = size = chunks = 0
+    started = time.perf_counter()
+    async for chunk in app.export_chunks(rows, fmt):
+        size += len(chunk)
+        count += chunk.count("\n")
+        chunks += 1
+        if chunks % 50 == 0:
+            peak = max(peak, rss_kb())
+    elapsed = time.perf_counter() - started
+    return {"rows": count, "mb": size / 2**20, "seconds": elapsed, "growth_kb": max(peak, rss_kb()) - baseline}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--formats", default="ndjson,csv")
+    parser.add_argument("--distribution", default="pareto", choices=["pareto", "uniform"])
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    app.activity_store = build_store(args.rows, args.users, args.distribution)
+    top_user = max(app.activity_store.users(), key=app.activity_store.count)
+    print(f"built {args.rows:,} rows for {len(app.activity_store.users()):,} users in "
+          f"{time.perf_counter() - started:.1f}s, RSS {rss_kb() / 1024:,.0f} MB")
+
+    baseline = rss_kb()
+    started = time.perf_counter()
+    page = list(itertools.islice(app.scan_logs(None, None, None, None), 101))
+    print(f"first page of {len(page) - 1} rows across all users in {(time.perf_counter() - started) * 1000:.1f} ms, "
+          f"RSS growth {(rss_kb() - baseline) / 1024:.1f} MB")
+
+    for fmt in args.formats.split(","):
+        for name, user_id in (("all users", None), (f"{top_user} ({app.activity_store.count(top_user):,} rows)", top_user)):
+            stats = asyncio.run(drain(app.scan_logs(user_id, None, None, None), fmt))
+            print(f"{fmt:<7} {name:<28} {stats['rows']:>11,} rows  {stats['rows'] / stats['seconds']:>9,.0f} rows/s  "
+                  f"{stats['mb'] / stats['seconds']:6.1f} MB/s  RSS growth {stats['growth_kb'] / 1024:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""/calculate_health_score latency for a light and a heavy user.
+
+Usage: python benchmarks/bench_health_score.py [--logs 100000] [--repeat 2000]
+
+The score reads incremental aggregates, so it should cost the same whatever
+the user's log count; tests/test_activity_store.py checks those aggregates
+against a full recomputation.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from common import format_row, summarize, time_calls  # also puts the backend on sys.path
+
+import app
+from activity_store import ActivityStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    now = datetime.now()
+    store = ActivityStore()
+    for i in range(args.logs):
+        store.append({"user_id": "heavy", "activity_type": rng.choice(["meal", "workout"]), "details": "x",
+                      "value": rng.randint(1, 900), "timestamp": now - timedelta(minutes=args.logs - i)})
+    store.append({"user_id": "light", "activity_type": "workout", "details": "x", "value": 30, "timestamp": now})
+    app.activity_store = store
+
+    loop = asyncio.new_event_loop()
+    for user_id in ("light", "heavy"):
+        request = app.HealthScoreRequest(age=30, weight=70, height=175, user_id=user_id)
+        samples = time_calls(lambda: loop.run_until_complete(app.calculate_health_score(request)), args.repeat)
+        print(format_row(f"score ({store.count(user_id):,} logs)", summarize(samples)))
+
+
+if __name__ == "__main__":
+    main()
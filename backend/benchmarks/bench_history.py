@@ -0,0 +1,52 @@
+"""/activity_history latency served from the per-user day index.
+
+Usage: python benchmarks/bench_history.py [--logs 10000000] [--users 100000] [--repeat 2000]
+
+The default of one million logs keeps memory modest; ten million needs several GB.
+"""
+import argparse
+import asyncio
+import random
+from datetime import date, timedelta
+
+from common import format_row, summarize, time_calls  # also puts the backend on sys.path
+
+import app
+from bench_activity_store import build_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    users = min(args.users, args.logs)
+    app.activity_store = build_store(args.logs, users)
+    print(f"== {args.logs:,} logs across {users:,} users")
+
+    loop = asyncio.new_event_loop()
+    rng = random.Random(3)
+    today = date.today()
+    past_monday = today - timedelta(days=today.weekday() + 21)
+
+    def history(**params):
+        return lambda: loop.run_until_complete(
+            app.get_activity_history(user_id=f"user_{rng.randrange(users)}", **{
+                "start": None, "end": None, "granularity": "day", "tz": None, "activity_type": "workout", **params}))
+
+    cases = {
+        "current week": history(),
+        "arbitrary week": history(start=past_monday, end=past_monday + timedelta(days=6)),
+        "12 months by month": history(start=today - timedelta(days=365), end=today, granularity="month"),
+        "8 weeks by week, all types": history(start=today - timedelta(weeks=8), end=today, granularity="week",
+                                             activity_type="all"),
+        "current week, America/New_York": history(tz="America/New_York"),
+    }
+    for name, call in cases.items():
+        print(format_row(name, summarize(time_calls(call, args.repeat))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compiled intent matcher vs. the original per-keyword substring scan.
+
+Usage: python benchmarks/bench_intent.py [--queries 20000]
+
+Reports per-query latency on a generated corpus, and how many intents
+whole-word mode changes. tests/test_nlp_utils.py checks that substring mode
+returns exactly the intents of the original implementation.
+"""
+import argparse
+import random
+
+from common import format_row, summarize, time_calls  # also puts the backend on sys.path
+
+from nlp_utils import SimpleNLP
+
+FILLER = ["i", "want", "to", "my", "great", "brunch", "today", "after", "the", "how", "can", "feel",
+          "better", "week", "morning", "what", "should", "do", "about", "really", "with", "some"]
+
+
+def legacy_detect_intent(intents, text):
+    """The original implementation: one substring search per keyword per intent."""
+    text_lower = text.lower()
+    scores = {}
+    for intent, keywords in intents.items():
+        score = sum(1 for kw in keywords if kw in text_lower)
+        if score > 0:
+            scores[intent] = score
+    if not scores:
+        return "general_health"
+    return max(scores, key=scores.get)
+
+
+def make_corpus(intents, size, seed=3):
+    rng = random.Random(seed)
+    vocabulary = [kw for keywords in intents.values() for kw in keywords]
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(4, 16))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(vocabulary).capitalize())
+        corpus.append(" ".join(words) + rng.choice(["?", ".", "!"]))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    compat = SimpleNLP()
+    word = SimpleNLP(whole_word=True)
+    corpus = make_corpus(compat.intents, args.queries)
+
+    changed = sum(1 for text in corpus if word.detect_intent(text) != compat.detect_intent(text))
+    print(f"whole-word mode changes the intent of {changed:,} of {len(corpus):,} queries")
+
+    def per_query(fn):
+        iterator = iter(corpus * 2)
+        return lambda: fn(next(iterator))
+
+    print(format_row("original", summarize(time_calls(per_query(lambda t: legacy_detect_intent(compat.intents, t)), len(corpus)))))
+    print(format_row("compiled (substring)", summarize(time_calls(per_query(compat.detect_intent), len(corpus)))))
+    print(format_row("compiled (whole word)", summarize(time_calls(per_query(word.detect_intent), len(corpus)))))
+
+
+if __name__ == "__main__":
+    main()
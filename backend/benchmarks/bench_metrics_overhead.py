@@ -0,0 +1,119 @@
+"""Cost of the /metrics instrumentation on the hot endpoints.
+
+Usage: python benchmarks/bench_metrics_overhead.py [--requests 10000] [--served 1000] [--limit 2.0]
+
+1. Calls the ASGI app in-process, switching the metrics registry on and off
+   between consecutive requests, and takes the difference of the median
+   request times: the instrumentation's own cost in microseconds. NLP runs
+   inline here, since the pool's thread hand-off is noisy and costs the same
+   either way.
+2. Measures the median latency of the same requests served over HTTP by
+   uvicorn with metrics on, which is what the cost adds to.
+
+Prints the cost as a share of both and exits non-zero when the share of the
+served latency exceeds --limit percent. The in-process share is higher
+because it leaves out HTTP parsing and socket I/O. Requires httpx.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("WELLORA_STORAGE", "memory")
+os.environ.setdefault("WELLORA_RESPONSE_SEED", "0")
+os.environ.setdefault("WELLORA_POOL_WORKERS", "0")
+
+import httpx
+
+from common import BACKEND_DIR, asgi_request  # also puts the backend on sys.path
+from load_event_loop import free_port
+
+import app
+from metrics import REGISTRY
+
+REQUESTS = [
+    ("POST", "/analyze_query", {"text": "I want a workout plan and some protein ideas for better sleep", "user_id": "default_user"}),
+    ("POST", "/log_activity", {"activity_type": "meal", "details": "Salad", "value": 350}),
+    ("POST", "/calculate_health_score", {"age": 30, "weight": 70, "height": 175}),
+    ("GET", "/activity_history", None),
+    ("POST", "/generate_report", {
+        "age": 30, "weight": 70, "height": 175, "activity_level": "moderate",
+        "dietary_preferences": ["vegan"], "health_goals": ["lose weight"],
+    }),
+]
+
+
+async def call(method: str, path: str, payload) -> int:
+    return await asgi_request(app.app, method, path, payload)
+
+
+async def instrumentation_cost(method: str, path: str, payload, requests: int):
+    """Returns (median cost of the instrumentation, median request time without it) in seconds."""
+    assert await call(method, path, payload) == 200, path
+    samples = {True: [], False: []}
+    for i in range(requests * 2):
+        # Alternating every request cancels out drift (store growth, CPU frequency, neighbours)
+        enabled = i % 2 == 0
+        REGISTRY.enabled = enabled
+        started = time.perf_counter()
+        await call(method, path, payload)
+        samples[enabled].append(time.perf_counter() - started)
+    REGISTRY.enabled = True
+    return statistics.median(samples[True]) - statistics.median(samples[False]), statistics.median(samples[False])
+
+
+def served_latencies(requests: int) -> dict:
+    port = free_port()
+    env = dict(os.environ)
+    env.pop("WELLORA_POOL_WORKERS")  # the server runs with its normal pool
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    latencies = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            for _ in range(200):
+                try:
+                    client.get("/")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.05)
+            for method, path, payload in REQUESTS:
+                samples = []
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    client.request(method, path, json=payload).raise_for_status()
+                    samples.append(time.perf_counter() - started)
+                latencies[path] = statistics.median(samples)
+    finally:
+        server.terminate()
+        server.wait()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--served", type=int, default=1000)
+    parser.add_argument("--limit", type=float, default=2.0)
+    args = parser.parse_args()
+
+    costs = {path: asyncio.run(instrumentation_cost(method, path, payload, args.requests)) for method, path, payload in REQUESTS}
+    served = served_latencies(args.served)
+    ok = True
+    for method, path, _ in REQUESTS:
+        cost, in_process = costs[path]
+        share = cost / served[path] * 100
+        ok = ok and share <= args.limit
+        print(f"{method:<4} {path:<24} cost={cost * 1e6:5.1f}us  "
+              f"in-process={in_process * 1e6:6.1f}us ({cost / in_process * 100:+5.2f}%)  "
+              f"served={served[path] * 1e6:7.1f}us ({share:+5.2f}%)")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
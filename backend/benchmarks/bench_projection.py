@@ -0,0 +1,56 @@
+"""Vectorized weight projection for many users and scenarios at once.
+
+Usage: python benchmarks/bench_projection.py [--users 100000] [--scenarios 5] [--weeks 104] [--budget 5.0]
+
+Simulates every user under every calorie scenario in a single call and
+fails if it takes longer than --budget seconds. Results are kept as
+float32 to halve memory (100k x 5 x 104 is about 200 MB).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import BACKEND_DIR  # noqa: F401  (puts the backend on sys.path)
+
+from health_model import ACTIVITY_MULTIPLIERS, HealthRecommender, project_weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--scenarios", type=int, default=5)
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--budget", type=float, default=5.0, help="seconds")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(2)
+    weight = rng.normal(80, 15, args.users).clip(40, 180)[:, None]
+    height = rng.normal(172, 10, args.users).clip(140, 210)[:, None]
+    age = rng.integers(18, 80, args.users)[:, None]
+    multiplier = rng.choice(list(ACTIVITY_MULTIPLIERS.values()), args.users)[:, None]
+    tdee = (10 * weight + 6.25 * height - 5 * age + 5) * multiplier
+    offsets = np.linspace(-750, 250, args.scenarios)[None, :]
+
+    started = time.perf_counter()
+    weights = project_weights(weight, height, age, multiplier, tdee + offsets, args.weeks, dtype=np.float32)
+    elapsed = time.perf_counter() - started
+    cells = weights.size
+    print(f"{args.users:,} users x {args.scenarios} scenarios x {args.weeks} weeks: {elapsed:.2f}s "
+          f"({cells / elapsed / 1e6:,.0f}M user-weeks/s, {weights.nbytes / 1e6:,.0f} MB)")
+
+    # The single-user path must agree with the vectorized one
+    recommender = HealthRecommender()
+    levels = {value: name for name, value in ACTIVITY_MULTIPLIERS.items()}
+    single = recommender.project_weight(float(weight[0, 0]), float(height[0, 0]), int(age[0, 0]),
+                                        levels[float(multiplier[0, 0])], offsets[0].tolist(), args.weeks)
+    expected = np.array([scenario["weight"] for scenario in single])
+    assert np.allclose(expected, weights[0], atol=0.01), "single-user projection diverged from the batch"
+
+    if elapsed > args.budget:
+        raise SystemExit(f"over budget: {elapsed:.2f}s > {args.budget:.2f}s")
+    print(f"within the {args.budget:.1f}s budget")
+
+
+if __name__ == "__main__":
+    main()
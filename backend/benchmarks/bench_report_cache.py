@@ -0,0 +1,79 @@
+"""/generate_report latency and CPU with and without the report cache.
+
+Usage: python benchmarks/bench_report_cache.py [--requests 50000] [--repeat-ratio 0.8]
+                                               [--redis-url redis://localhost:6379/0]
+
+A --repeat-ratio share of requests resubmits an earlier profile (skewed
+towards recent ones, like a user refreshing the report screen); the rest
+are new profiles. The worker pool runs inline so only handler CPU is
+measured. Pass --redis-url to also measure the shared Redis backend.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from common import format_row, summarize  # also puts the backend on sys.path
+
+import app
+from cache import LRUCache, RedisCache
+from worker_pool import WorkerPool
+
+GOALS = ["stress_reduction", "better_sleep", "muscle_gain", "spiritual_growth", "improved_flexibility"]
+LEVELS = ["sedentary", "light", "moderate", "active", "very_active"]
+
+
+def make_requests(count, repeat_ratio, seed=4):
+    rng = random.Random(seed)
+    seen, requests = [], []
+    for _ in range(count):
+        if seen and rng.random() < repeat_ratio:
+            profile = seen[-1 - min(int(rng.expovariate(0.05)), len(seen) - 1)]
+        else:
+            profile = app.HealthReportRequest(
+                age=rng.randint(18, 80), weight=round(rng.uniform(45, 130), 1), height=round(rng.uniform(150, 200), 1),
+                activity_level=rng.choice(LEVELS), dietary_preferences=rng.choice([[], ["vegan"]]),
+                health_goals=rng.sample(GOALS, rng.randint(0, 3)),
+            )
+            seen.append(profile)
+        requests.append(profile)
+    return requests
+
+
+def run(cache, requests):
+    app.report_cache = cache
+    loop = asyncio.new_event_loop()
+    samples = []
+    cpu_started = time.process_time()
+    for request in requests:
+        started = time.perf_counter()
+        loop.run_until_complete(app.generate_report(request))
+        samples.append(time.perf_counter() - started)
+    cpu = time.process_time() - cpu_started
+    loop.close()
+    return samples, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--repeat-ratio", type=float, default=0.8)
+    parser.add_argument("--cache-size", type=int, default=4096)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    app.worker_pool = WorkerPool(max_workers=0)
+    requests = make_requests(args.requests, args.repeat_ratio)
+    caches = {"no cache": LRUCache(max_size=0), "memory LRU": LRUCache(max_size=args.cache_size, ttl=3600)}
+    if args.redis_url:
+        caches["redis"] = RedisCache(args.redis_url, ttl=3600, prefix="wellora:bench:")
+
+    for name, cache in caches.items():
+        samples, cpu = run(cache, requests)
+        stats = cache.stats()
+        print(format_row(name, summarize(samples)) +
+              f"  cpu/request={cpu / len(requests) * 1e6:7.1f}us  hit_ratio={stats['hit_ratio']}")
+
+
+if __name__ == "__main__":
+    main()
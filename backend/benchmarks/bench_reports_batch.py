@@ -0,0 +1,64 @@
+"""Per-row HealthRecommender calls vs. the vectorized batch engine.
+
+Usage: python benchmarks/bench_reports_batch.py [--users 1000000] [--chunk-size 100000]
+
+tests/test_health_model.py checks that both give the same reports.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import BACKEND_DIR  # noqa: F401  (puts the backend on sys.path)
+
+from health_model import ACTIVITY_MULTIPLIERS, GOAL_RECOMMENDATIONS, VEGAN_RECOMMENDATION, HealthRecommender
+
+
+def make_population(size, seed=9):
+    rng = np.random.default_rng(seed)
+    levels = np.array(list(ACTIVITY_MULTIPLIERS) + ["unknown"])
+    goals = list(GOAL_RECOMMENDATIONS)
+    goal_flags = rng.random((size, len(goals))) < 0.3
+    return {
+        "age": rng.integers(18, 90, size).tolist(),
+        "weight": np.round(rng.normal(75, 18, size).clip(35, 200), 1).tolist(),
+        "height": np.round(rng.normal(170, 12, size).clip(130, 215), 1).tolist(),
+        "activity_level": levels[rng.integers(0, len(levels), size)].tolist(),
+        "health_goals": [[goal for goal, on in zip(goals, row) if on] for row in goal_flags.tolist()],
+        "dietary_preferences": [["vegan"] if v else [] for v in (rng.random(size) < 0.1).tolist()],
+    }
+
+
+def per_row(recommender, people, i):
+    weight, height = people["weight"][i], people["height"][i]
+    category = recommender.calculate_bmi(weight, height)
+    tdee = recommender.estimate_tdee(weight, height, people["age"][i], people["activity_level"][i])
+    recommendations = recommender.generate_recommendations(category, tdee, people["health_goals"][i])
+    if "vegan" in people["dietary_preferences"][i]:
+        recommendations.append(VEGAN_RECOMMENDATION)
+    return round(weight / ((height / 100) ** 2), 2), category, round(tdee), recommendations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    recommender = HealthRecommender()
+    people = make_population(args.users)
+
+    started = time.perf_counter()
+    for i in range(args.users):
+        per_row(recommender, people, i)
+    row_elapsed = time.perf_counter() - started
+    print(f"per-row:    {row_elapsed:7.2f}s  ({args.users / row_elapsed:12,.0f} users/s)")
+
+    started = time.perf_counter()
+    rows = sum(len(chunk["bmi"]) for chunk in recommender.generate_reports_batch(**people, chunk_size=args.chunk_size))
+    batch_elapsed = time.perf_counter() - started
+    print(f"vectorized: {batch_elapsed:7.2f}s  ({rows / batch_elapsed:12,.0f} users/s, {row_elapsed / batch_elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Allocations and latency of response assembly: per-request dict vs. the loaded catalog.
+
+Usage: python benchmarks/bench_responses.py [--calls 20000]
+
+"per-request dict" mimics the previous handler: it rebuilds the nested
+advice dict on every call and concatenates notes with +=.
+"""
+import argparse
+import json
+import random
+import tracemalloc
+
+from common import format_row, summarize, time_calls  # also puts the backend on sys.path
+
+from response_catalog import DEFAULT_PATH, ResponseCatalog
+
+ENTITIES = [{"label": "CARDINAL", "text": "30"}, {"label": "ACTIVITY", "text": "cardio"},
+            {"label": "PAIN_TYPE", "text": "sore"}]
+LAST_ACTIVITY = {"activity_type": "workout", "details": "Gym"}
+
+
+def make_legacy(raw):
+    def legacy_compose(intent, entities, last_activity):
+        import random
+        responses = {key: list(lines) for key, lines in raw["responses"].items()}
+        text_note = ""
+        for ent in entities:
+            label, text = ent["label"], ent["text"]
+            if label == "ACTIVITY":
+                text_note += f"\n\n{text.capitalize()} is a fantastic way to boost your mood and cardiovascular health!"
+            elif label == "PAIN_TYPE":
+                text_note += f"\n\nI'm sorry to hear about your {text}. Please take it slow and don't push through sharp pain."
+            elif label == "CARDINAL" and intent == "fitness_advice":
+                text_note += f"\n\nAiming for {text} minutes is a solid plan. Consistency over intensity is the secret!"
+        user_context = ""
+        if last_activity and intent == "fitness_advice" and last_activity["activity_type"] == "workout":
+            user_context = f"\n\nI see you recently did a {last_activity['details']} workout. Keep up that momentum!"
+        return random.choice(responses.get(intent, responses["general_health"])) + text_note + user_context
+    return legacy_compose
+
+
+def peak_allocation(fn):
+    """Peak bytes traced by tracemalloc while running one call."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with open(DEFAULT_PATH, encoding="utf-8") as f:
+        raw = json.load(f)
+    legacy = make_legacy(raw)
+    catalog = ResponseCatalog(seed=0)
+    random.seed(0)
+
+    cases = {
+        "per-request dict": lambda: legacy("fitness_advice", ENTITIES, LAST_ACTIVITY),
+        "catalog": lambda: catalog.compose("fitness_advice", ENTITIES, LAST_ACTIVITY),
+    }
+    for name, call in cases.items():
+        call()  # warm up caches so only per-call allocations are traced
+        print(format_row(name, summarize(time_calls(call, args.calls))) + f"  peak alloc/call={peak_allocation(call):,} B")
+
+
+if __name__ == "__main__":
+    main()
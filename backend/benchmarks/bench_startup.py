@@ -0,0 +1,137 @@
+"""Startup time and per-worker memory of serve.py with each spaCy loading mode.
+
+Usage: python benchmarks/bench_startup.py [--workers 1,4,16] [--modes eager,background,preload]
+
+For every worker count and mode, starts `serve.py --workers N` and reports
+the time until `/` first answers, the time until every worker reports the
+model ready on /ready?require_nlp=true, and each worker's RSS and PSS
+(proportional set size: pages shared by k processes count 1/k towards each)
+from /proc/<pid>/smaps_rollup, so Linux only. Modes:
+
+  eager       every worker loads the model before serving (the old behaviour)
+  background  workers serve at once and load the model in a thread
+  preload     the parent loads the model once and forks (serve.py --preload)
+
+When en_core_web_sm is not installed, a stand-in pipeline with the same
+components (untrained, so smaller) is built in a temporary directory.
+Requires httpx.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from common import BACKEND_DIR
+from load_event_loop import free_port
+
+MODES = {
+    "eager": ({"WELLORA_SPACY_LOAD": "eager"}, []),
+    "background": ({"WELLORA_SPACY_LOAD": "background"}, []),
+    "preload": ({"WELLORA_SPACY_LOAD": "background"}, ["--preload"]),
+}
+
+
+def model_path(directory: str) -> str:
+    import spacy
+
+    try:
+        spacy.load("en_core_web_sm")
+        return "en_core_web_sm"
+    except OSError:
+        pass
+    model = spacy.blank("en")
+    model.add_pipe("tok2vec")
+    model.add_pipe("tagger").add_label("NN")
+    model.add_pipe("parser").add_label("dep")
+    ner = model.add_pipe("ner")
+    for label in ("PERSON", "ORG", "DATE", "CARDINAL"):
+        ner.add_label(label)
+    model.initialize()
+    path = os.path.join(directory, "standin_model")
+    model.to_disk(path)
+    return path
+
+
+def memory_kb(pid: int) -> dict:
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            field, _, rest = line.partition(":")
+            if field in ("Rss", "Pss"):
+                memory[field] = int(rest.split()[0])
+    return memory
+
+
+async def wait_until_ready(base_url: str, workers: int, started: float, timeout: float = 600) -> dict:
+    """Polls until every worker has answered /ready?require_nlp=true with 200; returns timings and worker pids."""
+    first = None
+    ready_pids = set()
+    # A fresh connection per request, so the kernel spreads them over the workers' accept queues
+    limits = httpx.Limits(max_connections=workers * 2, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        while len(ready_pids) < workers:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"only {len(ready_pids)} of {workers} workers ready after {timeout}s")
+            if first is None:
+                try:
+                    await client.get("/")
+                    first = time.perf_counter() - started
+                except httpx.TransportError:
+                    await asyncio.sleep(0.02)
+                continue
+            responses = await asyncio.gather(
+                *(client.get("/ready", params={"require_nlp": "true"}) for _ in range(workers * 2)),
+                return_exceptions=True,
+            )
+            ready_pids.update(r.json()["pid"] for r in responses if isinstance(r, httpx.Response) and r.status_code == 200)
+            await asyncio.sleep(0.02)
+    return {"first_response": first, "all_ready": time.perf_counter() - started, "pids": sorted(ready_pids)}
+
+
+def run(mode: str, workers: int, model: str) -> dict:
+    env_overrides, flags = MODES[mode]
+    env = dict(os.environ, WELLORA_STORAGE="memory", WELLORA_SPACY_MODEL=model, **env_overrides)
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--port", str(port), "--workers", str(workers), "--log-level", "warning", *flags],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        result = asyncio.run(wait_until_ready(f"http://127.0.0.1:{port}", workers, started))
+        memory = [memory_kb(pid) for pid in result["pids"]]
+        parent = memory_kb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+    result["rss_kb"] = sum(m["Rss"] for m in memory) / workers
+    result["pss_kb"] = sum(m["Pss"] for m in memory) / workers
+    # The parent only holds pages the preloaded workers share, so it counts towards the total
+    result["total_pss_kb"] = sum(m["Pss"] for m in memory) + parent["Pss"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,4,16")
+    parser.add_argument("--modes", default="eager,background,preload")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        model = model_path(directory)
+        print(f"model: {model if model == 'en_core_web_sm' else 'stand-in (en_core_web_sm not installed)'}")
+        print(f"{'mode':<11} {'workers':>7} {'first /':>9} {'all ready':>10} {'RSS/worker':>11} {'PSS/worker':>11} {'total PSS':>10}")
+        for workers in [int(n) for n in args.workers.split(",")]:
+            for mode in args.modes.split(","):
+                r = run(mode, workers, model)
+                print(f"{mode:<11} {workers:>7} {r['first_response']:>8.2f}s {r['all_ready']:>9.2f}s "
+                      f"{r['rss_kb'] / 1024:>9.0f}MB {r['pss_kb'] / 1024:>9.0f}MB {r['total_pss_kb'] / 1024:>8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
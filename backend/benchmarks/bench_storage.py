@@ -0,0 +1,92 @@
+"""Sustained write throughput and time-to-ready after a restart for the durable backends.
+
+Usage: python benchmarks/bench_storage.py [--backend sqlite|segment] [--logs 50000000]
+                                          [--writers 256] [--snapshot-lag 0.01]
+
+Writes go through concurrent asyncio writers (one entry per submit, like
+/log_activity) so group commit has something to batch. After the load the
+backend is closed, a snapshot is taken `--snapshot-lag` of the way before
+the end (the tail a crash leaves behind the last background snapshot, see
+WELLORA_SNAPSHOT_EVERY), and a fresh store is restored from snapshot plus
+log tail.
+The default of one million logs keeps the run short; 50M needs a large disk.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from common import BACKEND_DIR  # noqa: F401  (puts the backend on sys.path)
+
+from activity_store import ActivityStore
+from storage import open_backend, restore, save_snapshot
+
+
+def make_entry(rng: random.Random, timestamp: datetime) -> dict:
+    return {
+        "user_id": f"user_{rng.randrange(100_000)}",
+        "activity_type": "workout",
+        "details": "Running",
+        "value": rng.randint(10, 90),
+        "timestamp": timestamp,
+    }
+
+
+async def write_load(backend, total: int, writers: int) -> ActivityStore:
+    store = ActivityStore()
+    start = datetime.now() - timedelta(days=365)
+
+    async def writer(worker_id: int):
+        rng = random.Random(worker_id)
+        for i in range(worker_id, total, writers):
+            entry = make_entry(rng, start + timedelta(seconds=i))
+            entry["id"] = (await asyncio.wrap_future(backend.submit([entry])))[0]
+            store.append(entry)
+
+    await asyncio.gather(*(writer(w) for w in range(writers)))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["sqlite", "segment"], default="segment")
+    parser.add_argument("--logs", type=int, default=1_000_000)
+    parser.add_argument("--writers", type=int, default=256)
+    parser.add_argument("--snapshot-lag", type=float, default=0.01)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="wellora-bench-")
+    try:
+        backend = open_backend(args.backend, directory)
+        started = time.perf_counter()
+        store = asyncio.run(write_load(backend, args.logs, args.writers))
+        elapsed = time.perf_counter() - started
+        backend.close()
+        print(f"{args.backend}: wrote {args.logs:,} logs in {elapsed:.2f}s "
+              f"({args.logs / elapsed:,.0f} logs/s with {args.writers} concurrent writers)")
+
+        # Snapshot everything except the newest `snapshot-lag` share, as a crash would leave it
+        cutoff = int(args.logs * (1 - args.snapshot_lag))
+        covered = ActivityStore(entry for entry in store if entry["id"] <= cutoff)
+        save_snapshot(covered, directory)
+        del store, covered
+
+        for label, use_snapshot in (("full replay", False), ("snapshot + tail", True)):
+            started = time.perf_counter()
+            backend = open_backend(args.backend, directory)
+            restored = ActivityStore()
+            restore(restored, backend, directory if use_snapshot else None)
+            elapsed = time.perf_counter() - started
+            backend.close()
+            print(f"{args.backend}: time-to-ready ({label}) {elapsed:.2f}s for {len(restored):,} logs")
+            del restored
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Scripts are run from the backend directory, e.g.
+`python benchmarks/bench_activity_store.py`.
+"""
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[idx]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarizes latency samples (seconds) as milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "mean_ms": (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+    }
+
+
+def time_calls(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def format_row(name: str, stats: Dict[str, float]) -> str:
+    return f"{name:<32} p50={stats['p50_ms']:8.3f}ms  p99={stats['p99_ms']:8.3f}ms  (n={stats['n']})"
+
+
+async def asgi_request(app, method: str, path: str, payload=None, query_string: bytes = b"") -> int:
+    """Calls an ASGI app directly, without HTTP or a socket; returns the response status."""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query_string, "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
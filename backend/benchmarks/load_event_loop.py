@@ -0,0 +1,103 @@
+"""Tail latency of /log_activity while /analyze_query is saturated.
+
+Usage: python benchmarks/load_event_loop.py [--modes inline,thread,process] [--duration 10]
+                                            [--analyzers 8] [--text-words 40000]
+
+Starts a uvicorn server per mode (inline = NLP on the event loop, as before
+the worker pool), saturates /analyze_query, and samples /log_activity
+latency from a separate client at the same time. The long query texts
+stand in for spaCy's per-document cost when en_core_web_sm is not
+installed; with the model, shorter texts show the same effect.
+Requires httpx.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import BACKEND_DIR, format_row, summarize
+
+MODES = {
+    "inline": {"WELLORA_POOL_WORKERS": "0"},
+    "thread": {"WELLORA_POOL_KIND": "thread"},
+    "process": {"WELLORA_POOL_KIND": "process"},
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(client: httpx.AsyncClient):
+    for _ in range(200):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(base_url: str, args) -> dict:
+    words = ["I", "want", "a", "workout", "plan", "and", "healthy", "meal", "ideas", "for", "better", "sleep"]
+    text = " ".join(random.Random(1).choice(words) for _ in range(args.text_words))
+    limits = httpx.Limits(max_connections=args.analyzers + 8)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        await wait_ready(client)
+        deadline = time.monotonic() + args.duration
+        busy = 0
+
+        async def analyzer():
+            nonlocal busy
+            while time.monotonic() < deadline:
+                response = await client.post("/analyze_query", json={"text": text})
+                busy += response.status_code == 503
+
+        async def logger():
+            samples = []
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                await client.post("/log_activity", json={"activity_type": "meal", "details": "Salad", "value": 350})
+                samples.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+            return samples
+
+        results = await asyncio.gather(logger(), *(analyzer() for _ in range(args.analyzers)))
+        stats = summarize(results[0])
+        stats["rejected_analyze"] = busy
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", default="inline,thread,process")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--analyzers", type=int, default=8)
+    parser.add_argument("--text-words", type=int, default=40000)
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        port = free_port()
+        env = dict(os.environ, **MODES[mode])
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            stats = asyncio.run(run_load(f"http://127.0.0.1:{port}", args))
+        finally:
+            server.terminate()
+            server.wait()
+        print(format_row(f"/log_activity ({mode})", stats) + f"  503s on /analyze_query: {stats['rejected_analyze']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Reproducible benchmark suite for the hot paths, with JSON results and baseline comparison.
+
+Usage: python benchmarks/suite.py [--output results.json] [--baseline baseline.json]
+                                  [--threshold 10] [--threshold-for load:/generate_report=25]
+                                  [--only micro,load] [--users 1000] [--days 90]
+                                  [--micro 5000] [--requests 2000] [--concurrency 16]
+                                  [--rounds 3] [--seed 42]
+
+Runs offline and in-process, on synthetic data (see synthetic.py) drawn from
+--seed, so two runs with the same arguments do the same work:
+
+- micro: SimpleNLP (intent detection, entity extraction, batch analysis) and
+  HealthRecommender (BMI, TDEE, recommendations, projections, vectorized reports).
+- load: drives the ASGI app directly, without HTTP, with --concurrency
+  clients per endpoint (/analyze_query, /log_activity, /calculate_health_score,
+  /activity_history, /generate_report) and for a weighted mix of them,
+  after filling the store with the synthetic users' logs.
+
+Each benchmark reports p50/p95/p99/mean latency and operations per second,
+each the best of --rounds runs. Results go to --output as JSON together
+with the machine, Python version, git commit and arguments. With
+--baseline, every benchmark present in both files is compared and the
+script exits non-zero if a --check metric got worse by more than
+--threshold percent (or the benchmark's --threshold-for). Only compare
+results from the same machine and arguments; on shared or throttled
+machines, raise --rounds or the thresholds. spaCy is not
+loaded unless WELLORA_SPACY_LOAD says so, so results don't depend on
+whether en_core_web_sm is installed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List
+
+os.environ.setdefault("WELLORA_STORAGE", "memory")
+os.environ.setdefault("WELLORA_RESPONSE_SEED", "0")
+os.environ.setdefault("WELLORA_SPACY_LOAD", "off")
+
+from common import BACKEND_DIR, asgi_request, summarize, time_calls  # also puts the backend on sys.path
+from synthetic import make_activity_logs, make_queries, make_users
+
+import app
+from activity_store import ActivityStore
+from health_model import HealthRecommender
+from nlp_utils import SimpleNLP
+
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "mean_ms")
+MIX = [("/analyze_query", 40), ("/log_activity", 25), ("/calculate_health_score", 15), ("/activity_history", 15), ("/generate_report", 5)]
+
+
+def with_throughput(samples: List[float]) -> Dict[str, float]:
+    stats = summarize(samples)
+    stats["ops_per_s"] = len(samples) / sum(samples) if samples else 0.0
+    return stats
+
+
+def best_of(rounds: int, run: Callable[[], Dict[str, float]]) -> Dict[str, float]:
+    """Runs a benchmark `rounds` times and keeps each metric's best value, which is far less noisy than one run."""
+    best = run()
+    for _ in range(rounds - 1):
+        stats = run()
+        for metric, value in stats.items():
+            if metric in LOWER_IS_BETTER:
+                best[metric] = min(best[metric], value)
+            elif metric == "ops_per_s":
+                best[metric] = max(best[metric], value)
+            else:
+                best[metric] += value
+    return best
+
+
+def cycle(items: List) -> Callable[[], object]:
+    """A callable returning the next item on each call, wrapping around."""
+    state = {"i": -1}
+
+    def step():
+        state["i"] = (state["i"] + 1) % len(items)
+        return items[state["i"]]
+    return step
+
+
+def micro_benchmarks(users: List[Dict], queries: List[str], repeat: int, rounds: int) -> Dict[str, Dict[str, float]]:
+    engine = SimpleNLP()
+    recommender = HealthRecommender()
+    next_query = cycle(queries)
+    next_user = cycle(users)
+    results = {}
+
+    def bench(name: str, fn: Callable[[], object], calls: int = repeat):
+        fn()  # warm-up
+        results[name] = best_of(rounds, lambda: with_throughput(time_calls(fn, calls)))
+
+    bench("nlp.detect_intent", lambda: engine.detect_intent(next_query()))
+    bench("nlp.extract_entities", lambda: engine.extract_entities(next_query()))
+    batches = [queries[i:i + 64] for i in range(0, len(queries) - 63, 64)]
+    next_batch = cycle(batches)
+    bench("nlp.analyze_batch[64]", lambda: engine.analyze_batch(next_batch()), max(1, repeat // 64))
+
+    def recommendations():
+        user = next_user()
+        bmi = recommender.calculate_bmi(user["weight"], user["height"])
+        tdee = recommender.estimate_tdee(user["weight"], user["height"], user["age"], user["activity_level"])
+        return recommender.generate_recommendations(bmi, tdee, user["health_goals"])
+
+    bench("health.recommendations", recommendations)
+
+    def projection():
+        user = next_user()
+        return recommender.project_weight(user["weight"], user["height"], user["age"], user["activity_level"],
+                                          [-750, -500, -250, 0, 250], weeks=52)
+
+    bench("health.project_weight[5x52w]", projection, max(1, repeat // 10))
+
+    def chart():
+        user = next_user()
+        tdee = recommender.estimate_tdee(user["weight"], user["height"], user["age"], user["activity_level"])
+        return recommender.generate_chart_data(tdee, user["weight"], user["height"], user["age"], user["activity_level"])
+
+    bench("health.chart_data", chart, max(1, repeat // 10))
+
+    columns = {field: [user[field] for user in users] for field in ("age", "weight", "height", "activity_level", "health_goals", "dietary_preferences")}
+    bench("health.reports_batch[users]", lambda: list(recommender.generate_reports_batch(**columns)), max(1, repeat // 100))
+    return results
+
+
+def fill_store(users: List[Dict], days: int, rng: random.Random) -> int:
+    entries = list(make_activity_logs(users, days, datetime.now(), rng))
+    for entry, entry_id in zip(entries, app.storage.submit(entries).result()):
+        entry["id"] = entry_id
+    app.activity_store = ActivityStore()
+    app.activity_store.extend(entries)
+    return len(entries)
+
+
+def request_factories(users: List[Dict], queries: List[str], rng: random.Random) -> Dict[str, Callable[[], tuple]]:
+    """Endpoint -> a function returning (method, path, payload, query string) for one random request."""
+    # Users who log more also use the app more
+    weights = [user["engagement"] for user in users]
+
+    def user():
+        return rng.choices(users, weights)[0]
+
+    def analyze_query():
+        return "POST", "/analyze_query", {"text": rng.choice(queries), "user_id": user()["user_id"]}, b""
+
+    def log_activity():
+        if rng.random() < 0.8:
+            payload = {"activity_type": "meal", "details": "Salad", "value": rng.randint(150, 1200)}
+        else:
+            payload = {"activity_type": "workout", "details": "Running", "value": rng.randint(10, 90)}
+        return "POST", "/log_activity", dict(payload, user_id=user()["user_id"]), b""
+
+    def health_score():
+        u = user()
+        return "POST", "/calculate_health_score", {"age": u["age"], "weight": u["weight"], "height": u["height"], "user_id": u["user_id"]}, b""
+
+    def history():
+        granularity, span = rng.choice([("day", 7), ("day", 30), ("week", 90), ("month", 365)])
+        end = date.today()
+        query = f"user_id={user()['user_id']}&granularity={granularity}&start={end - timedelta(days=span - 1)}&end={end}"
+        return "GET", "/activity_history", None, query.encode()
+
+    def report():
+        u = user()
+        payload = {field: u[field] for field in ("age", "weight", "height", "activity_level", "dietary_preferences", "health_goals")}
+        return "POST", "/generate_report", payload, b""
+
+    factories = {
+        "/analyze_query": analyze_query,
+        "/log_activity": log_activity,
+        "/calculate_health_score": health_score,
+        "/activity_history": history,
+        "/generate_report": report,
+    }
+    paths, path_weights = zip(*MIX)
+    factories["mix"] = lambda: factories[rng.choices(paths, path_weights)[0]]()
+    return factories
+
+
+async def drive(requests: List[tuple], concurrency: int) -> Dict[str, float]:
+    """Sends the requests from `concurrency` concurrent clients; each sends its next request once the last is answered."""
+    pending = iter(requests)
+    samples = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for method, path, payload, query in pending:
+            started = time.perf_counter()
+            status = await asgi_request(app.app, method, path, payload, query)
+            samples.append(time.perf_counter() - started)
+            errors += status >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stats = summarize(samples)
+    # Requests overlap, so throughput comes from wall time rather than the latencies
+    stats["ops_per_s"] = len(samples) / elapsed
+    stats["errors"] = errors
+    return stats
+
+
+def load_benchmarks(factories: Dict[str, Callable[[], tuple]], requests: int, concurrency: int, rounds: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, factory in factories.items():
+        batch = [factory() for _ in range(requests)]
+        asyncio.run(drive(batch[:max(1, requests // 10)], concurrency))  # warm-up
+        results[f"load:{name}"] = best_of(rounds, lambda: asyncio.run(drive(batch, concurrency)))
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: Dict, baseline: Dict, checks: List[str], threshold: float, overrides: Dict[str, float]) -> List[str]:
+    """Prints the change of every checked metric; returns the regressions beyond their threshold."""
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        limit = overrides.get(name, threshold)
+        changes = []
+        for metric in checks:
+            old, new = baseline[name].get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new / old - 1) * 100
+            worse = change if metric in LOWER_IS_BETTER else -change
+            flag = " !" if worse > limit else ""
+            changes.append(f"{metric}={change:+6.1f}%{flag}")
+            if worse > limit:
+                regressions.append(f"{name} {metric}: {old:.4g} -> {new:.4g} ({change:+.1f}%, limit {limit:g}%)")
+        print(f"{name:<32} " + "  ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    parser.add_argument("--threshold-for", action="append", default=[], metavar="NAME=PERCENT",
+                        help="per-benchmark threshold, e.g. load:mix=20; repeatable")
+    parser.add_argument("--check", default="p50_ms,p95_ms,ops_per_s", help="metrics compared with the baseline")
+    parser.add_argument("--only", default="micro,load")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--queries-per-intent", type=int, default=500)
+    parser.add_argument("--micro", type=int, default=5000, help="calls per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3, help="runs per benchmark; the best value of each metric is kept")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    overrides = {}
+    for item in args.threshold_for:
+        name, _, percent = item.rpartition("=")
+        overrides[name] = float(percent)
+
+    rng = random.Random(args.seed)
+    users = make_users(args.users, rng)
+    corpora = make_queries(SimpleNLP().intents, args.queries_per_intent, rng)
+    queries = [text for corpus in corpora.values() for text in corpus]
+    rng.shuffle(queries)
+
+    results = {}
+    suites = args.only.split(",")
+    if "micro" in suites:
+        results.update(micro_benchmarks(users, queries, args.micro, args.rounds))
+    if "load" in suites:
+        logs = fill_store(users, args.days, rng)
+        print(f"store: {logs:,} logs for {args.users:,} users over {args.days} days")
+        results.update(load_benchmarks(request_factories(users, queries, rng), args.requests, args.concurrency, args.rounds))
+    app.worker_pool.shutdown()
+
+    for name, stats in results.items():
+        errors = f"  errors={stats['errors']}" if stats.get("errors") else ""
+        print(f"{name:<32} p50={stats['p50_ms']:8.3f}ms  p95={stats['p95_ms']:8.3f}ms  p99={stats['p99_ms']:8.3f}ms  "
+              f"{stats['ops_per_s']:>10,.0f} ops/s{errors}")
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+            "env": {key: value for key, value in sorted(os.environ.items()) if key.startswith("WELLORA_")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("args", {}).get("seed") != args.seed or baseline["meta"].get("platform") != report["meta"]["platform"]:
+            print("warning: the baseline was recorded with a different seed or on a different platform")
+        print(f"-- compared with {args.baseline} (commit {baseline['meta'].get('commit', 'unknown')[:10]})")
+        regressions = compare(results, baseline["results"], args.check.split(","), args.threshold, overrides)
+        if regressions:
+            print("regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
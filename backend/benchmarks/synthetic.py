@@ -0,0 +1,105 @@
+"""Deterministic synthetic data for the benchmarks: users, activity logs and queries.
+
+Everything is drawn from a random.Random seeded by the caller, so the same
+seed always produces the same data on any machine.
+
+- Users have a profile (age, weight, height, activity level, goals) and an
+  engagement level drawn from a heavy-tailed distribution, so a few users
+  log far more than most.
+- Meals cluster around breakfast, lunch and dinner; workouts around early
+  morning and after work, more often on weekdays, longer at weekends.
+  Users start logging on different days and skip days at random.
+- Queries are phrased from each intent's keywords with filler templates;
+  some carry numbers or pain words so entity extraction has work to do.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+ACTIVITY_LEVELS = ["sedentary", "light", "moderate", "active", "very_active"]
+GOALS = ["stress_reduction", "better_sleep", "muscle_gain", "spiritual_growth", "improved_flexibility", "lose weight"]
+DIETS = ["vegan", "vegetarian", "keto", "none"]
+
+# (hour of the peak, spread in hours, typical kcal, chance a user logs it on a given day)
+MEALS = [(7.5, 0.75, 450, 0.7), (12.75, 0.75, 700, 0.85), (19.25, 1.0, 800, 0.9), (15.5, 1.5, 200, 0.35)]
+MEAL_DETAILS = ["Oatmeal", "Eggs", "Salad", "Pasta", "Rice bowl", "Sandwich", "Soup", "Steak", "Curry", "Fruit", "Yogurt"]
+WORKOUTS = [("Running", 35), ("Yoga", 45), ("Gym", 60), ("Cycling", 50), ("Walking", 30), ("Swimming", 40), ("HIIT", 25)]
+
+TEMPLATES = [
+    "{kw}",
+    "how can I improve my {kw}?",
+    "any tips about {kw} and {kw2}",
+    "I have been struggling with {kw} lately, what should I do?",
+    "what is a good {kw} routine for someone my age",
+    "is it bad to skip {kw} after {n} days",
+    "I'm {n} years old, tell me about {kw}",
+    "{kw} {kw2} help please",
+    "my {pain} has been bad since my {kw}",
+    "Can you suggest something for {kw} in {n} minutes?",
+]
+PAINS = ["headache", "backache", "back pain", "neck pain", "cramp", "stress", "anxiety"]
+
+
+def make_users(count: int, rng: random.Random) -> List[Dict]:
+    users = []
+    for i in range(count):
+        height = rng.gauss(171, 9)
+        bmi = max(16.0, rng.gauss(25.5, 4.5))
+        users.append({
+            "user_id": f"user{i}",
+            "age": rng.randint(18, 75),
+            "height": round(height, 1),
+            "weight": round(bmi * (height / 100) ** 2, 1),
+            "activity_level": rng.choices(ACTIVITY_LEVELS, weights=[30, 25, 25, 15, 5])[0],
+            "health_goals": rng.sample(GOALS, rng.randint(0, 2)),
+            "dietary_preferences": [rng.choices(DIETS, weights=[8, 12, 5, 75])[0]],
+            # Days with a workout per week, and the share of days anything is logged at all
+            "workouts_per_week": min(7.0, rng.expovariate(1 / 2.5)),
+            "engagement": min(1.0, 0.1 * rng.paretovariate(1.3)),
+        })
+    return users
+
+
+def _at(day: datetime, hour: float) -> datetime:
+    return day + timedelta(hours=min(23.99, max(0.0, hour)))
+
+
+def make_activity_logs(users: List[Dict], days: int, end: datetime, rng: random.Random) -> Iterator[Dict]:
+    """Yields logs for every user over the `days` days before `end`, in no particular order."""
+    first_day = (end - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    for user in users:
+        joined = rng.randrange(days)
+        for offset in range(joined, days):
+            if rng.random() > user["engagement"]:
+                continue
+            day = first_day + timedelta(days=offset)
+            weekend = day.weekday() >= 5
+            for peak, spread, kcal, chance in MEALS:
+                if rng.random() < chance:
+                    yield {
+                        "user_id": user["user_id"], "activity_type": "meal", "details": rng.choice(MEAL_DETAILS),
+                        "value": round(max(50.0, rng.lognormvariate(0, 0.35) * kcal)),
+                        "timestamp": _at(day, rng.gauss(peak + (1 if weekend else 0), spread)),
+                    }
+            if rng.random() < user["workouts_per_week"] / 7 * (0.8 if weekend else 1.08):
+                details, minutes = rng.choice(WORKOUTS)
+                hour = rng.gauss(10, 1.5) if weekend else rng.choice([rng.gauss(6.75, 0.75), rng.gauss(18, 1.25)])
+                yield {
+                    "user_id": user["user_id"], "activity_type": "workout", "details": details,
+                    "value": round(max(5.0, rng.gammavariate(4, minutes * (1.3 if weekend else 1.0) / 4))),
+                    "timestamp": _at(day, hour),
+                }
+
+
+def make_queries(intents: Dict[str, List[str]], per_intent: int, rng: random.Random) -> Dict[str, List[str]]:
+    """Queries phrased around each intent's keywords, per intent."""
+    corpora = {}
+    for intent, keywords in intents.items():
+        corpus = []
+        for _ in range(per_intent):
+            text = rng.choice(TEMPLATES).format(
+                kw=rng.choice(keywords), kw2=rng.choice(keywords), n=rng.randint(2, 90), pain=rng.choice(PAINS),
+            )
+            corpus.append(text.capitalize() if rng.random() < 0.5 else text)
+        corpora[intent] = corpus
+    return corpora
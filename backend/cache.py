@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class LRUCache:
+    """Bounded in-process cache with LRU eviction and an optional TTL (seconds).
+
+    Thread-safe, since cached work may run in the worker pool.
+    """
+
+    # Lookups are cheap enough to run on the event loop
+    blocking = False
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, count: bool = True) -> Optional[Any]:
+        """Look up `key`; with `count=False` the lookup is left out of the hit/miss counters."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += count
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += count
+                return None
+            self._entries.move_to_end(key)
+            self.hits += count
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCache:
+    """Cache shared by all workers through a Redis-compatible server (Redis, Valkey, KeyDB...).
+
+    Values are stored as JSON with a TTL. Size-based eviction is left to the
+    server (configure `maxmemory` with an LRU `maxmemory-policy`); its
+    `evicted_keys` counter is reported as evictions. Requires the `redis` package.
+    """
+
+    # Every lookup is a network round trip, so callers should keep it off the event loop
+    blocking = True
+
+    def __init__(self, url: str, ttl: Optional[float] = None, prefix: str = "wellora:"):
+        if redis is None:
+            raise RuntimeError("RedisCache needs the 'redis' package: pip install redis")
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self._client.get(self.prefix + key)
+        except redis.RedisError:
+            # A cache outage degrades to recomputing, never to a failed request
+            self.errors += 1
+            self.misses += 1
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            self._client.set(self.prefix + key, json.dumps(value), px=max(1, int(self.ttl * 1000)) if self.ttl else None)
+        except redis.RedisError:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        try:
+            evictions = self._client.info("stats").get("evicted_keys")
+        except redis.RedisError:
+            evictions = None
+        return {
+            "backend": "redis",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": evictions,
+            "errors": self.errors,
+        }
+
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a normalized, JSON-serializable request payload."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -1,6 +1,149 @@
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Mapping, Optional, Sequence, Union
 import random
 
+import numpy as np
+
+ACTIVITY_MULTIPLIERS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9
+}
+DEFAULT_ACTIVITY_MULTIPLIER = 1.2
+
+BMI_CATEGORIES = ("Underweight", "Normal", "Overweight", "Obese")
+BMI_BOUNDS = (18.5, 25, 30)
+
+# Goal-based advice, in the order it is added to a report
+GOAL_RECOMMENDATIONS = {
+    "stress_reduction": "Incorporate 10-15 minutes of guided meditation or deep breathing exercises daily to lower cortisol levels.",
+    "better_sleep": "Establish a 'digital sunset'—no screens 60 minutes before bed to improve sleep architecture.",
+    "muscle_gain": "Focus on progressive overload in your strength training and ensure protein intake is around 1.6g/kg of body weight.",
+    "spiritual_growth": "Try daily journaling or spending 20 minutes in nature to connect with your inner self and find peace.",
+    "improved_flexibility": "Add a 20-minute yoga flow or dynamic stretching routine at least 3 times a week.",
+}
+VEGAN_RECOMMENDATION = "Ensure adequate B12 and Iron intake through fortified foods or supplements."
+
+# Recommendation codes used by the batch engine; bit i of a row's mask is RECOMMENDATION_CODES[i]
+RECOMMENDATION_CODES = (
+    "reduce_calories", "daily_activity", "increase_calories", "strength_training", "maintenance_calories",
+    *GOAL_RECOMMENDATIONS, "vegan_nutrients",
+)
+_CODE_BITS = {code: 1 << i for i, code in enumerate(RECOMMENDATION_CODES)}
+
+Column = Union[Sequence[Any], np.ndarray]
+
+KCAL_PER_KG = 7700  # Energy content of a kilogram of body weight change
+MAX_PROJECTION_WEEKS = 520
+MIN_WEIGHT_KG = 30.0
+
+
+def mifflin_bmr(weight, height_cm, age):
+    """Mifflin-St Jeor BMR (male constant); works on scalars and NumPy arrays alike."""
+    return 10 * weight + 6.25 * height_cm - 5 * age + 5
+
+
+def project_weights(
+    weight,
+    height_cm,
+    age,
+    activity_multiplier,
+    daily_intake,
+    weeks: int,
+    thermogenesis: float = 0.1,
+    dtype=np.float64,
+) -> np.ndarray:
+    """
+    Simulates end-of-week body weight from energy balance with an adaptive TDEE.
+
+    Every week TDEE is re-estimated from the current weight (and age), then
+    lowered by up to `thermogenesis` in proportion to the relative deficit,
+    modelling adaptive thermogenesis. The weekly energy balance is converted
+    to weight at KCAL_PER_KG.
+
+    Inputs broadcast together, so users and scenarios can be simulated at once
+    (e.g. profile columns of shape (n, 1) with intakes of shape (n, k)).
+    Returns an array of the broadcast shape plus a trailing axis of `weeks`.
+    """
+    if not 0 < weeks <= MAX_PROJECTION_WEEKS:
+        raise ValueError(f"weeks must be between 1 and {MAX_PROJECTION_WEEKS}")
+    weight, height_cm, age, activity_multiplier, daily_intake = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (weight, height_cm, age, activity_multiplier, daily_intake))
+    )
+    current = weight.copy()
+    # Height and starting age don't change; only the weekly ageing term is added in the loop
+    static = 6.25 * height_cm - 5 * age + 5
+    base = np.empty_like(current)
+    scratch = np.empty_like(current)
+    # Weeks on the leading axis keep each weekly write contiguous
+    out = np.empty((weeks,) + current.shape, dtype=dtype)
+    for week in range(weeks):
+        # base = Mifflin-St Jeor TDEE at the current weight and age
+        np.multiply(current, 10, out=base)
+        base += static - 5 * week / 52
+        base *= activity_multiplier
+        # tdee = base * (1 - thermogenesis * relative deficit)
+        np.subtract(base, daily_intake, out=scratch)
+        scratch /= base
+        np.clip(scratch, 0.0, 1.0, out=scratch)
+        scratch *= -thermogenesis
+        scratch += 1
+        scratch *= base
+        # weight change from the week's energy balance
+        np.subtract(daily_intake, scratch, out=scratch)
+        scratch *= 7 / KCAL_PER_KG
+        current += scratch
+        np.maximum(current, MIN_WEIGHT_KG, out=current)
+        out[week] = current
+    return np.moveaxis(out, 0, -1)
+
+
+def recommendation_text(code: str, tdee: float) -> str:
+    """Renders a recommendation code as the sentence generate_recommendations would produce."""
+    if code == "reduce_calories":
+        return f"Aim for a daily intake of {int(tdee - 500)} calories mostly from whole foods."
+    if code == "daily_activity":
+        return "Incorporate 30 minutes of moderate activity daily."
+    if code == "increase_calories":
+        return f"Aim for a daily surplus, target {int(tdee + 300)} calories."
+    if code == "strength_training":
+        return "Focus on strength training to build muscle mass."
+    if code == "maintenance_calories":
+        return f"Maintenance calories are approximately {int(tdee)} kcal."
+    if code == "vegan_nutrients":
+        return VEGAN_RECOMMENDATION
+    return GOAL_RECOMMENDATIONS[code]
+
+
+def decode_recommendations(mask: int) -> List[str]:
+    return [code for code in RECOMMENDATION_CODES if mask & _CODE_BITS[code]]
+
+
+def _flag_bits(column: Optional[Column], bits: Dict[str, int], size: int) -> np.ndarray:
+    """ORs the bits of the names (goals, dietary preferences) listed in each row.
+
+    A mapping of name -> boolean column is also accepted, for callers that
+    already hold the data in that shape.
+    """
+    mask = np.zeros(size, dtype=np.int64)
+    if column is None:
+        return mask
+    if isinstance(column, Mapping):
+        for name, bit in bits.items():
+            if name in column:
+                mask |= np.asarray(column[name], dtype=bool) * bit
+        return mask
+
+    def row_bits(items):
+        row = 0
+        for item in items:
+            row |= bits.get(item, 0)
+        return row
+
+    return np.fromiter((row_bits(items) if items else 0 for items in column), dtype=np.int64, count=size)
+
+
 class HealthRecommender:
     def __init__(self):
         # We can load pre-trained ML models here (e.g., joblib/pickle files)
@@ -8,7 +151,12 @@ class HealthRecommender:
 
     def calculate_bmi(self, weight: float, height_cm: float) -> str:
         """Calculates BMI and returns category."""
-        bmi = weight / ((height_cm / 100) ** 2)
+        return self.bmi_category(self.bmi(weight, height_cm))
+
+    def bmi(self, weight: float, height_cm: float) -> float:
+        return weight / ((height_cm / 100) ** 2)
+
+    def bmi_category(self, bmi: float) -> str:
         if bmi < 18.5: return "Underweight"
         elif 18.5 <= bmi < 25: return "Normal"
         elif 25 <= bmi < 30: return "Overweight"
@@ -17,57 +165,153 @@ class HealthRecommender:
     def estimate_tdee(self, weight: float, height_cm: float, age: int, activity_level: str) -> float:
         """Estimates Total Daily Energy Expenditure using Mifflin-St Jeor equation."""
         # Simple assumption: Male BMR (can be refined with gender input)
-        bmr = 10 * weight + 6.25 * height_cm - 5 * age + 5
-        
-        multipliers = {
-            "sedentary": 1.2,
-            "light": 1.375,
-            "moderate": 1.55,
-            "active": 1.725,
-            "very_active": 1.9
-        }
-        return bmr * multipliers.get(activity_level, 1.2)
+        bmr = mifflin_bmr(weight, height_cm, age)
+        return bmr * ACTIVITY_MULTIPLIERS.get(activity_level, DEFAULT_ACTIVITY_MULTIPLIER)
 
     def generate_recommendations(self, bmi_category: str, tdee: float, goals: List[str]) -> List[str]:
         recommendations = []
-        
+
         # BMI-based advice
         if bmi_category in ["Overweight", "Obese"]:
-            recommendations.append(f"Aim for a daily intake of {int(tdee - 500)} calories mostly from whole foods.")
-            recommendations.append("Incorporate 30 minutes of moderate activity daily.")
+            recommendations.append(recommendation_text("reduce_calories", tdee))
+            recommendations.append(recommendation_text("daily_activity", tdee))
         elif bmi_category == "Underweight":
-            recommendations.append(f"Aim for a daily surplus, target {int(tdee + 300)} calories.")
-            recommendations.append("Focus on strength training to build muscle mass.")
+            recommendations.append(recommendation_text("increase_calories", tdee))
+            recommendations.append(recommendation_text("strength_training", tdee))
         else:
-            recommendations.append(f"Maintenance calories are approximately {int(tdee)} kcal.")
+            recommendations.append(recommendation_text("maintenance_calories", tdee))
 
         # Goal-based advice
-        if "stress_reduction" in goals:
-             recommendations.append("Incorporate 10-15 minutes of guided meditation or deep breathing exercises daily to lower cortisol levels.")
-        if "better_sleep" in goals:
-             recommendations.append("Establish a 'digital sunset'—no screens 60 minutes before bed to improve sleep architecture.")
-        if "muscle_gain" in goals:
-             recommendations.append("Focus on progressive overload in your strength training and ensure protein intake is around 1.6g/kg of body weight.")
-        if "spiritual_growth" in goals:
-             recommendations.append("Try daily journaling or spending 20 minutes in nature to connect with your inner self and find peace.")
-        if "improved_flexibility" in goals:
-             recommendations.append("Add a 20-minute yoga flow or dynamic stretching routine at least 3 times a week.")
-             
+        for goal, text in GOAL_RECOMMENDATIONS.items():
+            if goal in goals:
+                recommendations.append(text)
+
         return recommendations
 
-    def generate_chart_data(self, tdee: float) -> Dict[str, Any]:
-        """Generates mock data for health charts."""
+    def generate_reports_batch(
+        self,
+        age: Column,
+        weight: Column,
+        height: Column,
+        activity_level: Column,
+        health_goals: Optional[Column] = None,
+        dietary_preferences: Optional[Column] = None,
+        chunk_size: int = 100_000,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Vectorized counterpart of calculate_bmi/estimate_tdee/generate_recommendations
+        for many people at once. Inputs are equal-length columns; goals and dietary
+        preferences are per-row lists (or a mapping of name -> boolean column).
+        Only the per-row categorical inputs are encoded in Python; all arithmetic
+        runs as NumPy array operations, one chunk at a time.
+
+        Yields chunks of at most chunk_size rows as columns: bmi (rounded to 2 places),
+        bmi_category, tdee, daily_calories and recommendations, a bitmask over
+        RECOMMENDATION_CODES (see decode_recommendations).
+        """
+        age = np.asarray(age, dtype=np.float64)
+        weight = np.asarray(weight, dtype=np.float64)
+        height = np.asarray(height, dtype=np.float64)
+        size = len(age)
+        if not (len(weight) == len(height) == len(activity_level) == size):
+            raise ValueError("All columns must have the same length")
+
+        lookup = ACTIVITY_MULTIPLIERS.get
+        multipliers = np.fromiter(
+            (lookup(level, DEFAULT_ACTIVITY_MULTIPLIER) for level in activity_level), dtype=np.float64, count=size
+        )
+        goal_bits = _flag_bits(health_goals, {goal: _CODE_BITS[goal] for goal in GOAL_RECOMMENDATIONS}, size)
+        goal_bits |= _flag_bits(dietary_preferences, {"vegan": _CODE_BITS["vegan_nutrients"]}, size)
+
+        categories = np.array(BMI_CATEGORIES)
+        category_bits = np.array([
+            _CODE_BITS["increase_calories"] | _CODE_BITS["strength_training"],
+            _CODE_BITS["maintenance_calories"],
+            _CODE_BITS["reduce_calories"] | _CODE_BITS["daily_activity"],
+            _CODE_BITS["reduce_calories"] | _CODE_BITS["daily_activity"],
+        ])
+
+        for lo in range(0, size, chunk_size):
+            hi = min(lo + chunk_size, size)
+            w, h = weight[lo:hi], height[lo:hi]
+            bmi = w / (h / 100) ** 2
+            # NaN lands in the last bucket, like the scalar else-branch
+            category_idx = np.digitize(bmi, BMI_BOUNDS)
+            tdee = mifflin_bmr(w, h, age[lo:hi]) * multipliers[lo:hi]
+            yield {
+                "bmi": np.round(bmi, 2),
+                "bmi_category": categories[category_idx],
+                "tdee": tdee,
+                "daily_calories": np.rint(tdee).astype(np.int64),
+                "recommendations": category_bits[category_idx] | goal_bits[lo:hi],
+            }
+
+    def calorie_target_offset(self, bmi_category: str) -> int:
+        """Daily calories relative to TDEE that generate_recommendations advises."""
+        if bmi_category in ["Overweight", "Obese"]:
+            return -500
+        if bmi_category == "Underweight":
+            return 300
+        return 0
+
+    def project_weight(
+        self,
+        weight: float,
+        height_cm: float,
+        age: int,
+        activity_level: str,
+        calorie_offsets: Sequence[float],
+        weeks: int = 12,
+        tdee: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Week-by-week projection for one person under several daily calorie offsets from TDEE."""
+        if tdee is None:
+            tdee = self.estimate_tdee(weight, height_cm, age, activity_level)
+        intakes = tdee + np.asarray(calorie_offsets, dtype=np.float64)
+        multiplier = ACTIVITY_MULTIPLIERS.get(activity_level, DEFAULT_ACTIVITY_MULTIPLIER)
+        weights = project_weights(weight, height_cm, age, multiplier, intakes, weeks)
+        return [
+            {
+                "calorie_offset": offset,
+                "daily_calories": round(intake),
+                "weight": np.round(path, 2).tolist(),
+                "change": np.round(path - weight, 2).tolist(),
+            }
+            for offset, intake, path in zip(calorie_offsets, intakes.tolist(), weights)
+        ]
+
+    def generate_chart_data(
+        self,
+        tdee: float,
+        weight: Optional[float] = None,
+        height_cm: Optional[float] = None,
+        age: Optional[int] = None,
+        activity_level: Optional[str] = None,
+        weeks: int = 12,
+    ) -> Dict[str, Any]:
+        """Generates data for health charts."""
         # Macronutrient distribution
         macros = {
             "labels": ["Protein", "Carbs", "Fats"],
             "data": [0.3, 0.4, 0.3]  # Standard 30/40/30 split
         }
         
-        # Weight projection over 12 weeks based on deficit/surplus
-        weeks = list(range(1, 13))
-        projected_weight_change = [-0.5 * w for w in weeks] # Losing 0.5kg per week assumption
+        # Weight projection at the recommended intake, simulated from the user's energy balance
+        week_numbers = list(range(1, weeks + 1))
+        if weight and height_cm and age:
+            offset = self.calorie_target_offset(self.calculate_bmi(weight, height_cm))
+            scenario = self.project_weight(weight, height_cm, age, activity_level, [offset], weeks, tdee=tdee)[0]
+            projection = {
+                "weeks": week_numbers,
+                "change": scenario["change"],
+                "weight": scenario["weight"],
+                "daily_calories": scenario["daily_calories"],
+            }
+        else:
+            # Without a profile, fall back to the 0.5kg per week assumption
+            projection = {"weeks": week_numbers, "change": [-0.5 * w for w in week_numbers]}
         
         return {
             "macros": macros,
-            "weight_projection": {"weeks": weeks, "change": projected_weight_change}
+            "weight_projection": projection
         }
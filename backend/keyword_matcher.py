@@ -0,0 +1,69 @@
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def trie_pattern(keywords: Iterable[str]) -> str:
+    """Builds a regex alternation shaped like a prefix trie of `keywords`.
+
+    At any position the engine only follows branches whose next character
+    matches, and longer keywords are tried before their prefixes, so one
+    regex scan replaces a separate substring search per keyword.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if "" in node:
+            return "(?:" + "|".join(branches) + ")?"
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Finds occurrences of a fixed keyword vocabulary in one pass over the text.
+
+    With `whole_word=False` a keyword matches anywhere, exactly like
+    `keyword in text`; with `whole_word=True` it must start and end on a word
+    boundary, so "eat" no longer matches inside "great".
+    """
+
+    def __init__(self, keywords: Iterable[str], whole_word: bool = False):
+        self.keywords: Tuple[str, ...] = tuple(dict.fromkeys(kw.lower() for kw in keywords if kw))
+        self.whole_word = whole_word
+
+        pattern = trie_pattern(self.keywords)
+        if whole_word:
+            pattern = r"\b(?:" + pattern + r")\b"
+        self.pattern = pattern
+        # Zero-width lookahead so overlapping occurrences are reported too
+        self._find_re = re.compile("(?=(" + pattern + "))")
+
+        # Every keyword matching at a position is a prefix of the longest one matching there
+        vocabulary = set(self.keywords)
+        self._prefixes: Dict[str, List[str]] = {
+            kw: [kw[:i] for i in range(1, len(kw)) if kw[:i] in vocabulary] for kw in self.keywords
+        }
+
+    def find_all(self, text_lower: str) -> Set[str]:
+        """Returns the set of keywords occurring in already-lowercased text."""
+        found = set()
+        for match in self._find_re.finditer(text_lower):
+            keyword = match.group(1)
+            found.add(keyword)
+            start = match.start()
+            for prefix in self._prefixes[keyword]:
+                if not self.whole_word or not _WORD_CHAR.match(text_lower, start + len(prefix)):
+                    found.add(prefix)
+        return found
@@ -0,0 +1,307 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds / bytes; Prometheus adds +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _header(name: str, documentation: str, kind: str) -> List[str]:
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+
+
+def _histogram_lines(name: str, labelnames: Sequence[str], labels: Sequence[str], buckets: Sequence[float], counts: Sequence[float]) -> List[str]:
+    """`counts` is one count per bucket, then the +Inf count, then the sum of observed values."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(tuple(buckets) + (float("inf"),), counts):
+        cumulative += count
+        le = 'le="+Inf"' if bound == float("inf") else 'le="' + _number(bound) + '"'
+        lines.append(f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(counts[-1])}")
+    lines.append(f"{name}_count{_labels(labelnames, labels)} {cumulative}")
+    return lines
+
+
+class Histogram:
+    """Latency histogram safe to update from any thread.
+
+    Each thread records into its own shard without locking; shards are only
+    summed when rendering.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # One labels -> (per-bucket counts, +Inf count, sum) dict per thread
+        self._shards: List[Dict[Tuple[str, ...], List[float]]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        try:
+            children = self._local.children
+        except AttributeError:
+            children = self._local.children = {}
+            with self._lock:
+                self._shards.append(children)
+        counts = children.get(labels)
+        if counts is None:
+            counts = children[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, self.documentation, "histogram")
+        totals: Dict[Tuple[str, ...], List[float]] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for children in shards:
+            for labels, counts in list(children.items()):
+                total = totals.setdefault(labels, [0] * len(counts))
+                for idx, count in enumerate(list(counts)):
+                    total[idx] += count
+        for labels, counts in sorted(totals.items()):
+            lines.extend(_histogram_lines(self.name, self.labelnames, labels, self.buckets, counts))
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time, e.g. a store or queue size.
+
+    kind="counter" exposes a monotonic value kept elsewhere (say, cache hits) as a counter.
+    """
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        return _header(self.name, self.documentation, self.kind) + [f"{self.name} {_number(self.read())}"]
+
+
+class HttpMetrics:
+    """Request count, latency and body sizes per (method, route template).
+
+    All four are updated together by MetricsMiddleware on the event loop
+    thread, so this takes no lock; render it from the loop too.
+    """
+
+    LABELS = ("method", "route")
+
+    def __init__(self):
+        # (method, route) -> (status -> count, latency counts, request size counts, response size counts)
+        self._routes: Dict[Tuple[str, str], Tuple[Dict[int, int], List[float], List[float], List[float]]] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, request_bytes: int, response_bytes: int) -> None:
+        stats = self._routes.get((method, route))
+        if stats is None:
+            stats = self._routes[(method, route)] = (
+                {}, [0] * (len(LATENCY_BUCKETS) + 2), [0] * (len(SIZE_BUCKETS) + 2), [0] * (len(SIZE_BUCKETS) + 2)
+            )
+        statuses, latency, request_sizes, response_sizes = stats
+        statuses[status] = statuses.get(status, 0) + 1
+        latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        latency[-1] += seconds
+        request_sizes[bisect_left(SIZE_BUCKETS, request_bytes)] += 1
+        request_sizes[-1] += request_bytes
+        response_sizes[bisect_left(SIZE_BUCKETS, response_bytes)] += 1
+        response_sizes[-1] += response_bytes
+
+    def render(self) -> List[str]:
+        routes = sorted(self._routes.items())
+        lines = _header("wellora_requests_total", "HTTP requests by route and status.", "counter")
+        for labels, (statuses, _, _, _) in routes:
+            for status, count in sorted(statuses.items()):
+                lines.append(f"wellora_requests_total{_labels(self.LABELS + ('status',), labels + (str(status),))} {count}")
+        families = [
+            ("wellora_request_seconds", "HTTP request latency by route.", LATENCY_BUCKETS),
+            ("wellora_request_bytes", "HTTP request body size by route.", SIZE_BUCKETS),
+            ("wellora_response_bytes", "HTTP response body size by route.", SIZE_BUCKETS),
+        ]
+        for position, (name, documentation, buckets) in enumerate(families, 1):
+            lines.extend(_header(name, documentation, "histogram"))
+            for labels, stats in routes:
+                lines.extend(_histogram_lines(name, self.LABELS, labels, buckets, stats[position]))
+        return lines
+
+
+class Registry:
+    """The metrics one process exposes. Setting `enabled` to False turns every hook into a no-op."""
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics: List[Any] = []
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float], kind: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, documentation, read, kind))
+
+    def register(self, metric):
+        """Adds anything with a `render()` returning exposition lines."""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """The Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+HTTP_METRICS = REGISTRY.register(HttpMetrics())
+STAGE_SECONDS = REGISTRY.histogram("wellora_stage_seconds", "Latency of internal processing stages.", ("stage",))
+
+
+class stage:
+    """Times a block into wellora_stage_seconds: `with stage("ner"): ...`.
+
+    Work run in a process pool is recorded in the worker's registry, which
+    /metrics does not see.
+    """
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if REGISTRY.enabled:
+            STAGE_SECONDS.observe(time.perf_counter() - self.started, self.name)
+
+
+class SamplingProfiler:
+    """Runs cProfile over one request in every `every` and accumulates the stats.
+
+    cProfile follows the event loop thread, so a sampled request's profile also
+    contains whatever other requests ran on the loop meanwhile; work in other
+    threads (sync endpoints, the worker pool) is not included. Only one
+    request is profiled at a time.
+    """
+
+    def __init__(self, every: int = 0):
+        self.every = every
+        self.profiled = 0
+        self._seen = 0
+        self._active = False
+        self._stats: Optional[pstats.Stats] = None
+
+    def configure(self, every: int) -> None:
+        """Samples one request in every `every`; 0 turns profiling off."""
+        self.every = every
+        self._seen = 0
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if not self.every or self._active:
+            return None
+        self._seen += 1
+        if self._seen % self.every:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns this thread
+            return None
+        self._active = True
+        return profile
+
+    def stop(self, profile: cProfile.Profile) -> None:
+        profile.disable()
+        self._active = False
+        if self._stats is None:
+            self._stats = pstats.Stats(profile)
+        else:
+            self._stats.add(profile)
+        self.profiled += 1
+
+    def report(self, limit: int = 30, sort: str = "cumulative") -> str:
+        if self._stats is None:
+            return "No requests profiled yet.\n"
+        out = io.StringIO()
+        self._stats.stream = out
+        self._stats.sort_stats(sort).print_stats(limit)
+        return f"{self.profiled} requests profiled\n" + out.getvalue()
+
+    def reset(self) -> None:
+        self._stats = None
+        self.profiled = 0
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and body sizes of every HTTP request.
+
+    Requests are labelled by route template (e.g. /activity_logs), not by raw
+    path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app, profiler: Optional[SamplingProfiler] = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_bytes = response_bytes = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            else:
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        profile = self.profiler.start() if self.profiler else None
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            if profile is not None:
+                self.profiler.stop(profile)
+            route = scope.get("route")
+            HTTP_METRICS.observe(
+                scope["method"], route.path if route is not None else "unmatched", status,
+                time.perf_counter() - started, request_bytes, response_bytes,
+            )
@@ -1,18 +1,114 @@
+import os
 import re
+import threading
+import time
+from keyword_matcher import KeywordMatcher
+from metrics import stage
 
-# Handle potential compatibility issues with newer Python versions (like 3.14)
-try:
-    import spacy
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except Exception:
-        nlp = None
-except Exception:
-    spacy = None
-    nlp = None
+# The spaCy pipeline, set by ModelLoader once loaded; None until then or if it is unavailable
+nlp = None
+
+
+class ModelLoader:
+    """
+    Loads the spaCy pipeline off the import path. Until it is ready,
+    extract_entities skips NER and relies on the gazetteer alone.
+
+    mode (WELLORA_SPACY_LOAD): "background" starts loading when the app starts,
+    "lazy" when a query first needs NER, "eager" loads before the app serves
+    anything and "off" never loads. In every mode but "off", a process forked
+    before the model was ready loads its own copy when it first needs NER.
+    """
+
+    def __init__(self, name: str, mode: str = "background"):
+        if mode not in ("background", "lazy", "eager", "off"):
+            raise ValueError(f"Unknown spaCy load mode: {mode}")
+        self.name = name
+        self.mode = mode
+        self.status = "disabled" if mode == "off" else "unloaded"
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._loading = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def load(self) -> bool:
+        """Loads the model in the calling thread unless already tried; returns True if it is available."""
+        global nlp
+        with self._lock:
+            if self.status in ("ready", "unavailable", "disabled"):
+                return self.status == "ready"
+            self.status = "loading"
+            started = time.perf_counter()
+            try:
+                # Importing spaCy alone takes about a second, so it is deferred too
+                import spacy
+                model = spacy.load(self.name)
+            except Exception as exc:  # spaCy or the model missing, or incompatible with this Python
+                self.status, self.error = "unavailable", f"{type(exc).__name__}: {exc}"
+                return False
+            finally:
+                self._loading = False
+            nlp = model
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.status = "ready"
+            return True
+
+    def load_in_background(self) -> None:
+        with self._lock:
+            if self.status != "unloaded" or self._loading:
+                return
+            self._loading = True
+            self.status = "loading"
+        threading.Thread(target=self.load, name="wellora-spacy-load", daemon=True).start()
+
+    def request(self) -> None:
+        """Called when a query could use NER but the model is not loaded yet."""
+        if self.status == "unloaded" and self.mode != "off":
+            self.load_in_background()
+
+    def describe(self) -> dict:
+        return {"model": self.name, "mode": self.mode, "status": self.status, "load_seconds": self.load_seconds, "error": self.error}
+
+    def _after_fork(self) -> None:
+        # A load running in the parent has no thread here, and its lock may be held forever
+        self._lock = threading.Lock()
+        if self.status == "loading":
+            self.status, self._loading = "unloaded", False
+
+
+model_loader = ModelLoader(
+    os.environ.get("WELLORA_SPACY_MODEL", "en_core_web_sm"),
+    mode=os.environ.get("WELLORA_SPACY_LOAD", "background"),
+)
+
+_SEPARATOR = re.compile(r"\W+")
+
+
+def _fold_separator(match) -> str:
+    return " " if match.group() == " " else "|"
+
+
+def fold_query(text: str) -> str:
+    """
+    Cache key form of a query: lowercased, with leading and trailing
+    punctuation and spacing dropped and every other run of them except a
+    single space turned into "|". Keywords are lowercase words joined by
+    single spaces, so texts that fold alike get the same keyword intent and
+    entities: "Back  pain??" and "back-pain" do, "back pain" stays apart.
+    """
+    return _SEPARATOR.sub(_fold_separator, text.lower()).strip("| ")
 
 class SimpleNLP:
-    def __init__(self):
+    def __init__(self, whole_word: bool = False, ner_mode: str = "fallback"):
+        """
+        whole_word=False keeps the original substring semantics (identical intents);
+        whole_word=True only counts keywords that appear as whole words.
+        ner_mode controls spaCy NER in extract_entities: "fallback" (only when the
+        gazetteer finds nothing), "always" or "never".
+        """
+        if ner_mode not in ("fallback", "always", "never"):
+            raise ValueError(f"Unknown ner_mode: {ner_mode}")
         self.intents = {
             "dietary_advice": ["diet", "food", "nutrition", "eat", "meal", "protein", "calories", "fat", "carbs", "sugar", "vitamin", "recipe", "healthy", "snack"],
             "fitness_advice": ["exercise", "workout", "fitness", "run", "gym", "cardio", "strength", "training", "workout", "walk", "jog", "lift", "squat", "pushup", "muscle"],
@@ -23,50 +119,120 @@ class SimpleNLP:
             "spiritual_health": ["spirit", "soul", "purpose", "meaning", "connection", "inner", "universe", "yoga", "breathe", "gratitude", "nature", "meditation", "mindfulness"],
             "pain_points": ["pain", "hurt", "headache", "backache", "sore", "tired", "fatigue", "stressed", "anxious", "low energy", "insomnia", "bloated", "cramp"]
         }
+        self.whole_word = whole_word
+
+        # Compile the whole vocabulary once; a keyword listed twice for an intent counts twice
+        self._intent_matcher = KeywordMatcher(
+            [kw for keywords in self.intents.values() for kw in keywords], whole_word=whole_word
+        )
+        self._keyword_intents = {}
+        for intent, keywords in self.intents.items():
+            for kw in keywords:
+                self._keyword_intents.setdefault(kw, []).append(intent)
+
+        # Entity gazetteer: keyword -> label
+        self.gazetteer = {"protein": "NUTRIENT", "cardio": "ACTIVITY"}
+        for kw in ["headache", "backache", "back pain", "neck pain", "sore", "bloated", "cramp", "ach", "stress", "anxiety"]:
+            self.gazetteer[kw] = "PAIN_TYPE"
+        self.ner_mode = ner_mode
+        self._entity_re = re.compile(
+            r"(?P<num>\d+)|" + KeywordMatcher(self.gazetteer, whole_word=whole_word).pattern
+        )
 
     def detect_intent(self, text: str):
+        with stage("intent"):
+            return self._detect_intent(text)
+
+    def _detect_intent(self, text: str):
         text_lower = text.lower()
         
-        # Calculate scores for each intent based on keyword matches
-        scores = {}
-        for intent, keywords in self.intents.items():
-            score = sum(1 for kw in keywords if kw in text_lower)
-            if score > 0:
-                scores[intent] = score
+        # Score every intent from a single pass over the text
+        scores = dict.fromkeys(self.intents, 0)
+        for kw in self._intent_matcher.find_all(text_lower):
+            for intent in self._keyword_intents[kw]:
+                scores[intent] += 1
         
-        if not scores:
+        # Return the intent with the highest score (first declared wins ties)
+        best = max(scores, key=scores.get)
+        if scores[best] == 0:
             return "general_health"
-        
-        # Return the intent with the highest score
-        return max(scores, key=scores.get)
+        return best
 
     def extract_entities(self, text: str):
-        entities = []
-        
-        # Use spaCy for NER if available
-        if nlp:
-            doc = nlp(text)
-            for ent in doc.ents:
-                entities.append({
-                    "label": ent.label_,
-                    "text": ent.text
-                })
-        
-        # Fallback/Additional hardcoded extraction
-        if "protein" in text.lower():
-            entities.append({"label": "NUTRIENT", "text": "protein"})
-        if "cardio" in text.lower():
-            entities.append({"label": "ACTIVITY", "text": "cardio"})
-        
-        # Pain types
-        pain_keywords = ["headache", "backache", "back pain", "neck pain", "sore", "bloated", "cramp", "ach", "stress", "anxiety"]
-        for kw in pain_keywords:
-            if kw in text.lower():
-                entities.append({"label": "PAIN_TYPE", "text": kw})
+        with stage("gazetteer"):
+            entities = self._gazetteer_entities(text)
         
-        # Extract numbers (e.g., "I walked 5km", "I ate 2000 calories")
-        numbers = re.findall(r'\d+', text)
-        for num in numbers:
-            entities.append({"label": "CARDINAL", "text": num})
+        # spaCy NER only runs when the cheap pass can't resolve anything (or always, if configured)
+        if self._needs_ner(entities):
+            if nlp:
+                with stage("ner"):
+                    entities = self._merge_ner(entities, nlp(text))
+            else:
+                model_loader.request()
             
+        return [{"label": label, "text": ent_text} for _, _, label, ent_text in entities]
+
+    def analyze_batch(self, texts, batch_size: int = 64, n_process: int = 1):
+        """
+        Detects intents and extracts entities for many texts at once. Texts that
+        need spaCy NER go through nlp.pipe in batches of batch_size, optionally
+        over n_process processes. Results are returned in input order.
+        """
+        texts = list(texts)
+        with stage("intent_batch"):
+            intents = [self._detect_intent(text) for text in texts]
+        with stage("gazetteer_batch"):
+            entities = [self._gazetteer_entities(text) for text in texts]
+
+        pending = [i for i, ents in enumerate(entities) if self._needs_ner(ents)]
+        if pending and not nlp:
+            model_loader.request()
+        elif pending:
+            with stage("ner_batch"):
+                docs = nlp.pipe((texts[i] for i in pending), batch_size=batch_size, n_process=n_process)
+                for i, doc in zip(pending, docs):
+                    entities[i] = self._merge_ner(entities[i], doc)
+
+        return [
+            {"intent": intent, "entities": [{"label": label, "text": ent_text} for _, _, label, ent_text in ents]}
+            for intent, ents in zip(intents, entities)
+        ]
+
+    def _gazetteer_entities(self, text: str):
+        """
+        One regex pass over the lowercased text yields gazetteer hits and numbers
+        as (start, end, label, text). Hits are leftmost-longest, so "headache"
+        no longer also reports "ach"; repeated keywords are reported once.
+        """
+        entities = []
+        seen = set()
+        for match in self._entity_re.finditer(text.lower()):
+            number = match.group("num")
+            if number:
+                # Numbers (e.g., "I walked 5km", "I ate 2000 calories")
+                entities.append((match.start(), match.end(), "CARDINAL", number))
+                continue
+            kw = match.group()
+            if kw not in seen:
+                seen.add(kw)
+                entities.append((match.start(), match.end(), self.gazetteer[kw], kw))
         return entities
+
+    def uses_ner(self, text: str) -> bool:
+        """Whether extract_entities runs spaCy NER on text. Apart from the model being loaded, this ignores case."""
+        return nlp is not None and self._needs_ner(self._gazetteer_entities(text))
+
+    def _needs_ner(self, entities) -> bool:
+        if self.ner_mode == "always":
+            return True
+        return self.ner_mode == "fallback" and not entities
+
+    @staticmethod
+    def _merge_ner(entities, doc):
+        """Adds spaCy entities that don't overlap a span the gazetteer already resolved."""
+        merged = list(entities)
+        for ent in doc.ents:
+            if not any(ent.start_char < end and start < ent.end_char for start, end, _, _ in entities):
+                merged.append((ent.start_char, ent.end_char, ent.label_, ent.text))
+        merged.sort(key=lambda entity: entity[0])
+        return merged
@@ -0,0 +1,128 @@
+import json
+import os
+import random
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "responses.json")
+SUPPORTED_VERSIONS = (1,)
+
+
+class _Catalog(NamedTuple):
+    version: int
+    fallback: Tuple[str, ...]
+    responses: Mapping[str, Tuple[str, ...]]
+    # (label, intent) -> template; intent None applies to every intent
+    entity_notes: Mapping[Tuple[str, Optional[str]], str]
+    # intent -> (activity_type of the last log, template)
+    history_notes: Mapping[str, Tuple[str, str]]
+
+
+def _parse(data: Dict[str, Any]) -> _Catalog:
+    version = data.get("version")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported response catalog version: {version}")
+
+    responses = {intent: tuple(lines) for intent, lines in data["responses"].items()}
+    fallback_intent = data.get("fallback_intent", "general_health")
+    if not responses.get(fallback_intent):
+        raise ValueError(f"Response catalog has no responses for fallback intent {fallback_intent!r}")
+
+    entity_notes = {}
+    for label, note in data.get("entity_notes", {}).items():
+        if isinstance(note, str):
+            entity_notes[(label, None)] = note
+        else:
+            for intent, template in note.items():
+                entity_notes[(label, intent)] = template
+
+    history_notes = {
+        intent: (note["activity_type"], note["template"]) for intent, note in data.get("history_notes", {}).items()
+    }
+    return _Catalog(
+        version=version,
+        fallback=responses[fallback_intent],
+        responses=MappingProxyType(responses),
+        entity_notes=MappingProxyType(entity_notes),
+        history_notes=MappingProxyType(history_notes),
+    )
+
+
+class ResponseCatalog:
+    """Assistant advice strings, loaded once from a versioned JSON file.
+
+    The parsed catalog is immutable and swapped in whole by `reload`, so a
+    reload never exposes a half-updated catalog to concurrent requests.
+    With `check_interval` set, `compose` also reloads the file when its mtime
+    changed, at most once per interval (seconds), so every worker process
+    picks up an edit on its own.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, seed: Optional[int] = None, check_interval: Optional[float] = None):
+        self.path = path
+        self.check_interval = check_interval
+        # Why the last automatic reload failed, if it did; the previous catalog stays in use
+        self.error: Optional[str] = None
+        self._rng = random.Random(seed)
+        self._mtime = os.path.getmtime(path)
+        self._catalog = self._load()
+        self._next_check = time.monotonic() + (check_interval or 0)
+
+    @property
+    def version(self) -> int:
+        return self._catalog.version
+
+    def _load(self) -> _Catalog:
+        with open(self.path, encoding="utf-8") as f:
+            return _parse(json.load(f))
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-reads the file if it changed; returns True if a new catalog was loaded.
+
+        A file that fails to parse raises and leaves the current catalog in place.
+        """
+        mtime = os.path.getmtime(self.path)
+        if not force and mtime == self._mtime:
+            return False
+        self._catalog = self._load()
+        self._mtime = mtime
+        return True
+
+    def seed(self, seed: Optional[int]) -> None:
+        """Reseeds response selection, e.g. to make tests deterministic."""
+        self._rng.seed(seed)
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            self.reload()
+            self.error = None
+        except (OSError, ValueError, KeyError) as exc:
+            self.error = str(exc)  # Retried on the next check
+
+    def compose(self, intent: str, entities: List[dict], last_activity: Optional[dict] = None) -> str:
+        if self.check_interval:
+            self._check()
+        catalog = self._catalog
+        parts = [self._rng.choice(catalog.responses.get(intent) or catalog.fallback)]
+
+        # Personalize based on entities
+        notes = catalog.entity_notes
+        for ent in entities:
+            label = ent.get("label")
+            template = notes.get((label, intent)) or notes.get((label, None))
+            if template:
+                text = ent.get("text")
+                parts.append(template.format(text=text, text_capitalized=text.capitalize()))
+
+        # Personalize based on User History/State
+        if last_activity:
+            history_note = catalog.history_notes.get(intent)
+            if history_note and last_activity["activity_type"] == history_note[0]:
+                parts.append(history_note[1].format(details=last_activity["details"]))
+
+        return "\n\n".join(parts)
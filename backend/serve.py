@@ -0,0 +1,89 @@
+"""Runs several uvicorn workers on one socket, optionally sharing a preloaded spaCy model.
+
+Usage: python serve.py [--host 127.0.0.1] [--port 8000] [--workers 4] [--preload]
+
+With --preload the parent loads the spaCy model (WELLORA_SPACY_MODEL) and
+the app's libraries once and then forks the workers, so they share those
+pages copy-on-write instead of each loading a private copy. The app itself
+is only imported in the workers: its storage writer thread and database
+connections don't survive a fork. As with `uvicorn --workers`, every worker
+keeps its own in-memory activity index. With WELLORA_STORAGE=sqlite each
+worker polls the database for its peers' writes, so reads may lag them by up
+to WELLORA_STORAGE_POLL seconds; the memory backend never shares them and the
+segment backend refuses a second worker. Linux/macOS only (needs os.fork).
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+
+import uvicorn
+
+
+def run_worker(sock: socket.socket, log_level: str) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config("app:app", log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--preload", action="store_true", help="load the spaCy model before forking the workers")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    if args.preload:
+        # The model and the heavier libraries only; nothing that starts threads or opens files
+        import fastapi  # noqa: F401
+        import health_model  # noqa: F401
+        import nlp_utils
+
+        if not nlp_utils.model_loader.load():
+            print(f"spaCy model not preloaded: {nlp_utils.model_loader.error}", file=sys.stderr)
+    # Objects created so far are never collected, so the workers' collector never touches
+    # (and un-shares) their pages
+    gc.freeze()
+
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, args.log_level)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    sock.close()
+
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    # Ctrl-C reaches the workers through the process group already; forwarding
+    # it again would make uvicorn skip its graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, forward)
+    status = 0
+    for _ in children:
+        _, code = os.wait()
+        status = status or os.waitstatus_to_exitcode(code)
+    sys.exit(status if status > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+import json
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from activity_store import ActivityStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SNAPSHOT_FILE = "snapshot.pickle"
+_FIELDS = ("user_id", "activity_type", "details", "value")
+
+
+class StorageBackend:
+    """Durable sink for activity logs.
+
+    The in-memory ActivityStore stays the read path; a backend only has to
+    persist entries and hand them back on startup. Writes go through a single
+    writer thread that commits everything queued since the previous commit in
+    one transaction (group commit), so one fsync is shared by many requests.
+    """
+
+    # Whether other processes may write to the same storage (see tail)
+    shared = False
+
+    def __init__(self, batch_size: int = 1024, commit_interval: float = 0.002):
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self._queue: "queue.Queue[Optional[Tuple[List[Dict[str, Any]], Future]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._run, name=f"{type(self).__name__}-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, entries: List[Dict[str, Any]]) -> Future:
+        """Queues entries for durable storage.
+
+        The returned future resolves to the ids assigned to the entries, in
+        order, once they have been committed.
+        """
+        future: Future = Future()
+        self._queue.put((entries, future))
+        return future
+
+    def replay(self, after_id: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yields stored entries with an id greater than `after_id`, in id order."""
+        raise NotImplementedError
+
+    def tail(self) -> List[Dict[str, Any]]:
+        """Returns entries other processes committed since the last replay or tail."""
+        return []
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write(self, entries: List[Dict[str, Any]]) -> List[int]:
+        """Writes entries without syncing and returns their ids; if it raises, nothing is written."""
+        raise NotImplementedError
+
+    def _sync(self) -> None:
+        pass
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            pending = [item]
+            count = len(item[0])
+            deadline = time.monotonic() + self.commit_interval
+            # Gather whatever else arrives within the commit window
+            while count < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+                count += len(item[0])
+
+            try:
+                ids = self._write([entry for entries, _ in pending for entry in entries])
+            except Exception as exc:
+                # A failed _write leaves nothing behind, so one bad entry need not fail the
+                # other requests in its commit: retry them one by one
+                if len(pending) == 1:
+                    pending[0][1].set_exception(exc)
+                else:
+                    for item in pending:
+                        self._commit([item])
+                continue
+            self._finish(pending, ids)
+
+    def _commit(self, pending: List[Tuple[List[Dict[str, Any]], Future]]) -> None:
+        try:
+            ids = self._write([entry for entries, _ in pending for entry in entries])
+        except Exception as exc:
+            for _, future in pending:
+                future.set_exception(exc)
+            return
+        self._finish(pending, ids)
+
+    def _finish(self, pending: List[Tuple[List[Dict[str, Any]], Future]], ids: List[int]) -> None:
+        try:
+            self._sync()
+        except Exception as exc:
+            for _, future in pending:
+                future.set_exception(exc)
+            return
+        offset = 0
+        for entries, future in pending:
+            future.set_result(ids[offset:offset + len(entries)])
+            offset += len(entries)
+
+
+class MemoryBackend(StorageBackend):
+    """Keeps nothing on disk; only assigns ids. This is the default."""
+
+    def __init__(self):
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def submit(self, entries: List[Dict[str, Any]]) -> Future:
+        with self._lock:
+            ids = list(range(self._next_id, self._next_id + len(entries)))
+            self._next_id += len(entries)
+        future: Future = Future()
+        future.set_result(ids)
+        return future
+
+    def replay(self, after_id: int = 0) -> Iterator[Dict[str, Any]]:
+        if after_id >= self._next_id:
+            self._next_id = after_id + 1
+        return iter(())
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(StorageBackend):
+    """Embedded SQLite database in WAL mode.
+
+    Ids are assigned inside an IMMEDIATE transaction, so several worker
+    processes can share the same database file. Each worker's ActivityStore
+    only sees its peers' writes once `tail` has picked them up.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, **kwargs):
+        self.path = path
+        # Ids this process wrote and tail hasn't passed yet, so tail doesn't return them twice
+        self._own_ids = set()
+        self._own_lock = threading.Lock()
+        self._tail_id = 0
+        self._tail_conn = None
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS activity_logs ("
+            "id INTEGER PRIMARY KEY, user_id TEXT, activity_type TEXT NOT NULL, "
+            "details TEXT NOT NULL, value REAL NOT NULL, timestamp TEXT NOT NULL)"
+        )
+        conn.close()
+        self._conn = None
+        super().__init__(**kwargs)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _write(self, entries: List[Dict[str, Any]]) -> List[int]:
+        if self._conn is None:
+            self._conn = self._connect()
+        conn = self._conn
+        ids: List[int] = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM activity_logs").fetchone()[0]
+            ids = list(range(first_id, first_id + len(entries)))
+            # Registered before COMMIT, as tail can see the rows as soon as they are committed
+            with self._own_lock:
+                self._own_ids.update(ids)
+            conn.executemany(
+                "INSERT INTO activity_logs (id, user_id, activity_type, details, value, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (entry_id, e["user_id"], e["activity_type"], e["details"], e["value"], e["timestamp"].isoformat())
+                    for entry_id, e in zip(ids, entries)
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            with self._own_lock:
+                self._own_ids.difference_update(ids)
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+
+    @staticmethod
+    def _rows(conn: sqlite3.Connection, after_id: int) -> Iterator[Dict[str, Any]]:
+        cursor = conn.execute(
+            "SELECT id, user_id, activity_type, details, value, timestamp "
+            "FROM activity_logs WHERE id > ? ORDER BY id",
+            (after_id,),
+        )
+        for row in cursor:
+            yield {
+                "id": row[0],
+                "user_id": row[1],
+                "activity_type": row[2],
+                "details": row[3],
+                "value": row[4],
+                "timestamp": datetime.fromisoformat(row[5]),
+            }
+
+    def replay(self, after_id: int = 0) -> Iterator[Dict[str, Any]]:
+        self._tail_id = max(self._tail_id, after_id)
+        conn = self._connect()
+        try:
+            for entry in self._rows(conn, after_id):
+                self._tail_id = max(self._tail_id, entry["id"])
+                yield entry
+        finally:
+            conn.close()
+
+    def tail(self) -> List[Dict[str, Any]]:
+        # IMMEDIATE transactions commit in id order, so the committed ids are always a prefix
+        if self._tail_conn is None:
+            self._tail_conn = self._connect()
+        entries = []
+        for entry in self._rows(self._tail_conn, self._tail_id):
+            self._tail_id = entry["id"]
+            with self._own_lock:
+                if entry["id"] in self._own_ids:
+                    self._own_ids.discard(entry["id"])
+                    continue
+            entries.append(entry)
+        return entries
+
+    def close(self) -> None:
+        super().close()
+        if self._conn is not None:
+            self._conn.close()
+        if self._tail_conn is not None:
+            self._tail_conn.close()
+
+
+class SegmentLogBackend(StorageBackend):
+    """Append-only log of JSON lines split into fixed-size segment files.
+
+    Segments are named after the first id they contain, so replay can skip
+    every segment a snapshot already covers without opening it. A torn
+    record at the tail (crash mid-write) is dropped on startup.
+
+    Ids are counted in process, so only one process may write a directory:
+    the constructor takes an exclusive lock on it and fails if another
+    process holds it (run a single worker with this backend).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, **kwargs):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "LOCK"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise RuntimeError(
+                    f"{directory} is in use by another process; the segment backend supports a single worker"
+                ) from None
+        self._next_id = self._recover() + 1
+        self._file = None
+        super().__init__(**kwargs)
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                segments.append((int(name[8:-4]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _recover(self) -> int:
+        """Truncates a torn tail record and returns the last committed id."""
+        segments = self._segments()
+        if not segments:
+            return 0
+        path = segments[-1][1]
+        last_id = segments[-1][0] - 1
+        good_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    last_id = json.loads(line)["id"]
+                except ValueError:
+                    break
+                good_bytes += len(line)
+        if good_bytes != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good_bytes)
+                os.fsync(f.fileno())
+        return last_id
+
+    def _write(self, entries: List[Dict[str, Any]]) -> List[int]:
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            if self._file is not None:
+                self._file.close()
+            path = os.path.join(self.directory, f"segment-{self._next_id:012d}.log")
+            self._file = open(path, "ab")
+
+        ids = list(range(self._next_id, self._next_id + len(entries)))
+        lines = []
+        for entry_id, e in zip(ids, entries):
+            record = {"id": entry_id, "timestamp": e["timestamp"].isoformat()}
+            for field in _FIELDS:
+                record[field] = e[field]
+            lines.append(json.dumps(record, separators=(",", ":")))
+        self._file.write(("\n".join(lines) + "\n").encode("utf-8"))
+        self._next_id += len(entries)
+        return ids
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def replay(self, after_id: int = 0) -> Iterator[Dict[str, Any]]:
+        segments = self._segments()
+        for idx, (first_id, path) in enumerate(segments):
+            if idx + 1 < len(segments) and segments[idx + 1][0] <= after_id + 1:
+                continue  # Entirely covered by the snapshot
+            with open(path, "rb") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["id"] > after_id:
+                        record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+                        yield record
+
+    def close(self) -> None:
+        super().close()
+        if self._file is not None:
+            self._file.close()
+        self._lock_file.close()  # Releases the flock
+
+
+def save_snapshot(store: ActivityStore, directory: str) -> int:
+    """Writes the store to a snapshot file and returns the last id it covers.
+
+    Only the gap-free id prefix is written: with several workers sharing one
+    database, a worker's store can miss entries written by its peers, and
+    those must still be replayed from the backend.
+    """
+    entries = sorted(store, key=lambda entry: entry["id"])
+    last_id = 0
+    for entry in entries:
+        if entry["id"] != last_id + 1:
+            break
+        last_id += 1
+
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": 1, "last_id": last_id, "entries": entries[:last_id]}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return last_id
+
+
+def restore(store: ActivityStore, backend: StorageBackend, directory: Optional[str]) -> int:
+    """Loads the latest snapshot, then replays only the entries written after it.
+
+    Returns the number of entries restored.
+    """
+    last_id = 0
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE) if directory else None
+    if snapshot_path and os.path.exists(snapshot_path):
+        with open(snapshot_path, "rb") as f:
+            snapshot = pickle.load(f)
+        store.extend(snapshot["entries"])
+        last_id = snapshot["last_id"]
+    store.extend(backend.replay(after_id=last_id))
+    return len(store)
+
+
+class StoreSync:
+    """Background thread that keeps the store and its snapshot current.
+
+    Every `poll` seconds it adds the entries other workers committed to a
+    shared backend, and writes a snapshot once the entries added since the
+    last one reach `snapshot_every` (or a quarter of the store, as every
+    snapshot rewrites all of it), or `snapshot_interval` seconds have passed
+    with anything new. A crash then replays at most that tail on startup.
+    """
+
+    def __init__(self, store: ActivityStore, backend: StorageBackend, directory: str, snapshot_every: int = 100_000,
+                 snapshot_interval: float = 600.0, poll: float = 1.0):
+        self.store = store
+        self.backend = backend
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.poll = poll
+        self.snapshots = 0
+        self.error: Optional[str] = None
+        self._covered = len(store)
+        self._snapshot_at = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StoreSync", daemon=True)
+
+    def start(self) -> "StoreSync":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def step(self) -> None:
+        if self.backend.shared:
+            self.store.extend(self.backend.tail())
+        pending = len(self.store) - self._covered
+        due = time.monotonic() - self._snapshot_at >= self.snapshot_interval
+        if pending >= max(self.snapshot_every, self._covered // 4) or (due and pending > 0):
+            self._covered = len(self.store)
+            self._snapshot_at = time.monotonic()
+            save_snapshot(self.store, self.directory)
+            self.snapshots += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll):
+            try:
+                self.step()
+            except Exception as exc:  # e.g. disk full; retried on the next poll
+                self.error = repr(exc)
+
+
+def open_backend(kind: str, directory: str) -> StorageBackend:
+    """Creates the backend selected by WELLORA_STORAGE: memory, sqlite or segment."""
+    if kind == "memory":
+        return MemoryBackend()
+    os.makedirs(directory, exist_ok=True)
+    if kind == "sqlite":
+        return SQLiteBackend(os.path.join(directory, "activity_logs.db"))
+    if kind == "segment":
+        return SegmentLogBackend(os.path.join(directory, "segments"))
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend's modules import each other by plain name, as when run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
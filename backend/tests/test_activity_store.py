@@ -0,0 +1,165 @@
+import itertools
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import activity_store
+from activity_store import ActivityStore
+
+NOW = datetime(2024, 6, 15, 18, 30)
+
+
+def recompute(entries, today):
+    """Reference aggregates computed from scratch over raw logs."""
+    counts, days = {}, {}
+    for entry in entries:
+        counts[entry["activity_type"]] = counts.get(entry["activity_type"], 0) + 1
+        bucket = days.setdefault(entry["timestamp"].date(), {})
+        bucket[entry["activity_type"]] = bucket.get(entry["activity_type"], 0) + entry["value"]
+
+    day = today if today in days else today - timedelta(days=1)
+    streak = 0
+    while day in days:
+        streak, day = streak + 1, day - timedelta(days=1)
+
+    def rolling(n):
+        window = [days[d] for d in (today - timedelta(days=i) for i in range(n)) if d in days]
+        sums = {}
+        for bucket in window:
+            for activity_type, value in bucket.items():
+                sums[activity_type] = sums.get(activity_type, 0) + value
+        return {"active_days": len(window), "sums": sums}
+
+    return {"counts": counts, "active_days": len(days), "streak": streak, "last_7": rolling(7), "last_30": rolling(30)}
+
+
+def check_consistency(store, entries, today):
+    aggregates = store.aggregates("u")
+    actual = {"counts": aggregates.counts, "active_days": aggregates.active_days,
+              "streak": aggregates.current_streak(today),
+              "last_7": aggregates.rolling(7, today), "last_30": aggregates.rolling(30, today)}
+    assert actual == recompute(entries, today)
+
+
+def log(rng, day_offset):
+    return {"user_id": "u", "activity_type": rng.choice(["meal", "workout"]), "details": "x",
+            "value": rng.randint(1, 900), "timestamp": NOW - timedelta(days=day_offset, minutes=rng.randrange(600))}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_shuffled_history_matches_recomputation(seed):
+    rng = random.Random(seed)
+    skipped = {rng.randrange(2, 400) for _ in range(40)}
+    entries = [log(rng, offset) for offset in (rng.randrange(400) for _ in range(5000)) if offset not in skipped]
+    rng.shuffle(entries)
+    check_consistency(ActivityStore(entries), entries, NOW.date())
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("batched", [False, True])
+def test_late_logs_filling_gaps_join_streaks(seed, batched):
+    rng = random.Random(seed)
+    gaps = rng.sample(range(0, 60), 12)
+    entries = [log(rng, offset) for offset in range(60) if offset not in gaps]
+    store = ActivityStore(entries)
+    check_consistency(store, entries, NOW.date())
+    # The gaps are filled newest first, oldest first or at random
+    for late in (sorted(gaps), sorted(gaps, reverse=True), rng.sample(gaps, len(gaps)))[seed % 3]:
+        batch = [log(rng, late) for _ in range(rng.randint(1, 3))]
+        if batched:
+            store.extend(batch)
+        else:
+            for entry in batch:
+                store.append(entry)
+        entries += batch
+        check_consistency(store, entries, NOW.date())
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_future_dated_logs(seed):
+    rng = random.Random(seed)
+    offsets = [rng.randrange(-10, 40) for _ in range(200)]
+    entries = [log(rng, offset) for offset in offsets]
+    rng.shuffle(entries)
+    store = ActivityStore()
+    for entry in entries[:100]:
+        store.append(entry)
+    store.extend(entries[100:])
+    # As days pass, the future logs become today's and then past ones
+    for days_later in range(-2, 14):
+        check_consistency(store, entries, NOW.date() + timedelta(days=days_later))
+
+
+def paged(store, page_size, user_ids=None, **filters):
+    """All entries of a scan, read in keyset pages of `page_size` as /activity_logs does."""
+    pages, after = [], None
+    while True:
+        page = list(itertools.islice(store.scan(user_ids, after=after, **filters), page_size))
+        if not page:
+            return pages
+        pages.append([entry["id"] for entry in page])
+        assert len(pages) <= len(store), "paging does not advance"
+        after = page[-1]["timestamp"], page[-1]["id"]
+
+
+@pytest.mark.parametrize("insert", ["append", "extend", "merge"])
+def test_equal_timestamps_page_in_id_order_whatever_the_insert_order(insert):
+    # e.g. two bulk uploads whose extend calls finish in the opposite order to their commits
+    store = ActivityStore()
+    ts = NOW - timedelta(days=1)
+    filler = [{"user_id": "u", "activity_type": "meal", "details": "x", "value": 1, "id": 100 + i,
+               "timestamp": ts + timedelta(minutes=1 + i)} for i in range(activity_store.MIN_MERGE_BATCH)]
+    store.extend(filler)
+    for ids in ([3, 4], [1, 2]):
+        batch = [{"user_id": "u", "activity_type": "meal", "details": "x", "value": 1, "id": i, "timestamp": ts}
+                 for i in ids]
+        if insert == "append":
+            for entry in batch:
+                store.append(entry)
+        else:
+            # Enough older entries alongside to take the merge path
+            extra = [dict(entry, id=1000 * ids[0] + n, timestamp=ts - timedelta(seconds=n))
+                     for n, entry in enumerate(filler)] if insert == "merge" else []
+            store.extend(batch + extra)
+    expected = [e["id"] for e in sorted(store, key=lambda e: (e["timestamp"], e["id"]))]
+    assert expected[expected.index(1):expected.index(1) + 4] == [1, 2, 3, 4]
+    assert [i for page in paged(store, 2, ["u"]) for i in page] == expected
+    assert [i for page in paged(store, 2) for i in page] == expected
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_keyset_paging_matches_a_sorted_reference(seed, monkeypatch):
+    # Small buckets and chunks so index bucket splits and chunk boundaries fall inside ties
+    monkeypatch.setattr(activity_store, "INDEX_BUCKET", 4)
+    monkeypatch.setattr(activity_store, "SCAN_CHUNK", 5)
+    monkeypatch.setattr(activity_store, "SCAN_FIRST_CHUNK", 2)
+    rng = random.Random(seed)
+    entries = [{"user_id": f"u{rng.randrange(4)}", "activity_type": rng.choice(["meal", "workout"]),
+                "details": "x", "value": 1, "id": i, "timestamp": NOW - timedelta(minutes=rng.randrange(40))}
+               for i in range(1, 601)]
+    rng.shuffle(entries)
+    store = ActivityStore()
+    position = 0
+    while position < len(entries):
+        batch = entries[position:position + rng.choice([1, 3, 80])]
+        position += len(batch)
+        if len(batch) == 1:
+            store.append(batch[0])
+        else:
+            store.extend(batch)
+
+    start, end = NOW - timedelta(minutes=30), NOW - timedelta(minutes=5)
+    for user_ids, filters in [(None, {}), (["u1"], {}), (["u0", "u2"], {}), (None, {"start": start, "end": end}),
+                              (["u3"], {"start": start, "activity_type": "meal"}), (None, {"activity_type": "workout"})]:
+        expected = sorted(
+            (e["timestamp"], e["id"]) for e in entries
+            if (user_ids is None or e["user_id"] in user_ids)
+            and ("start" not in filters or e["timestamp"] >= filters["start"])
+            and ("end" not in filters or e["timestamp"] < filters["end"])
+            and filters.get("activity_type", e["activity_type"]) == e["activity_type"]
+        )
+        for page_size in (1, 7, 1000):
+            pages = paged(store, page_size, user_ids, **filters)
+            assert [i for page in pages for i in page] == [i for _, i in expected]
+            assert all(len(page) == page_size for page in pages[:-1])
@@ -0,0 +1,57 @@
+import os
+
+os.environ.setdefault("WELLORA_STORAGE", "memory")
+os.environ.setdefault("WELLORA_SPACY_LOAD", "off")
+os.environ.setdefault("WELLORA_POOL_WORKERS", "0")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app.app) as client:
+        yield client
+
+
+def bulk_csv(client, body: bytes):
+    return client.post("/log_activities/bulk", content=body, headers={"Content-Type": "text/csv"})
+
+
+def test_bulk_csv_accepts_a_byte_order_mark(client):
+    response = bulk_csv(client, "﻿user_id,activity_type,details,value\nbom_user,meal,Soup,300\n".encode())
+    assert response.json()["accepted"] == 1
+    assert app.activity_store.count("bom_user") == 1
+
+
+@pytest.mark.parametrize("header", [
+    "userid,activity_type,details,value",
+    "activity_type,details,value",
+    "user_id,activity_type,details,value,value",
+])
+def test_bulk_csv_refuses_a_bad_header(client, header):
+    response = bulk_csv(client, f"{header}\nu,meal,Soup,300\n".encode())
+    assert response.status_code == 400
+
+
+def test_bulk_reports_non_finite_values_per_line(client):
+    response = bulk_csv(client, b"user_id,activity_type,details,value\nnan_user,meal,x,nan\nnan_user,meal,x,5\n")
+    body = response.json()
+    assert (body["accepted"], body["rejected"]) == (1, 1)
+    assert body["errors"][0]["line"] == 2
+    response = client.post("/log_activities/bulk", content=b'{"user_id":"nan_user","activity_type":"meal","details":"x","value":NaN}\n')
+    assert response.json()["rejected"] == 1
+
+
+@pytest.mark.parametrize("value", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_workout_cannot_break_the_health_score(client, value):
+    body = f'{{"user_id":"score_user","activity_type":"workout","details":"run","value":{value}}}'
+    response = client.post("/log_activity", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    assert client.post("/log_activity", json={"user_id": "score_user", "activity_type": "workout", "details": "run", "value": 30}).status_code == 200
+
+    response = client.post("/calculate_health_score", json={"user_id": "score_user"})
+    assert response.status_code == 200
+    assert response.json()["stats"]["last_7_days"]["sums"]["workout"] % 30 == 0
@@ -0,0 +1,23 @@
+from cache import LRUCache
+
+
+def test_uncounted_lookups_leave_the_hit_ratio_alone():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    assert cache.get("a", count=False) == 1
+    assert cache.get("b", count=False) is None
+    assert (cache.hits, cache.misses) == (0, 0)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_uncounted_lookups_still_refresh_recency():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a", count=False)
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
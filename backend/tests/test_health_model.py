@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+import pytest
+
+from health_model import (ACTIVITY_MULTIPLIERS, GOAL_RECOMMENDATIONS, VEGAN_RECOMMENDATION, HealthRecommender,
+                          decode_recommendations, recommendation_text)
+
+
+def make_population(size, seed):
+    rng = random.Random(seed)
+    levels = list(ACTIVITY_MULTIPLIERS) + ["unknown"]
+    people = {
+        "age": [rng.randint(18, 89) for _ in range(size)],
+        "weight": [round(min(200.0, max(35.0, rng.gauss(75, 18))), 1) for _ in range(size)],
+        "height": [round(min(215.0, max(130.0, rng.gauss(170, 12))), 1) for _ in range(size)],
+        "activity_level": [rng.choice(levels) for _ in range(size)],
+        "health_goals": [[goal for goal in GOAL_RECOMMENDATIONS if rng.random() < 0.3] for _ in range(size)],
+        "dietary_preferences": [["vegan"] if rng.random() < 0.1 else [] for _ in range(size)],
+    }
+    # BMI exactly on each category bound (2 m tall: weight = 4 * BMI)
+    for bound in (18.5, 25.0, 30.0):
+        for column, value in (("age", 40), ("weight", 4 * bound), ("height", 200.0), ("activity_level", "moderate"),
+                              ("health_goals", []), ("dietary_preferences", [])):
+            people[column].append(value)
+    return people
+
+
+def per_row(recommender, people, i):
+    weight, height = people["weight"][i], people["height"][i]
+    category = recommender.calculate_bmi(weight, height)
+    tdee = recommender.estimate_tdee(weight, height, people["age"][i], people["activity_level"][i])
+    recommendations = recommender.generate_recommendations(category, tdee, people["health_goals"][i])
+    if "vegan" in people["dietary_preferences"][i]:
+        recommendations.append(VEGAN_RECOMMENDATION)
+    return round(weight / ((height / 100) ** 2), 2), category, round(tdee), recommendations
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_reports_batch_matches_per_row(seed):
+    recommender = HealthRecommender()
+    people = make_population(2000, seed)
+    rows = len(people["age"])
+    chunks = list(recommender.generate_reports_batch(**people, chunk_size=rows // 3 + 1))
+    batch = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+    assert len(batch["bmi"]) == rows
+    for i in range(rows):
+        bmi, category, calories, texts = per_row(recommender, people, i)
+        tdee = batch["tdee"][i]
+        rendered = [recommendation_text(code, tdee) for code in decode_recommendations(int(batch["recommendations"][i]))]
+        assert batch["bmi_category"][i] == category, i
+        assert batch["daily_calories"][i] == calories, i
+        assert rendered == texts, i
+        # np.round and round() may disagree on a last-digit tie; anything larger is a bug
+        assert abs(batch["bmi"][i] - bmi) <= 0.0100001, i
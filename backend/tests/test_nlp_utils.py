@@ -0,0 +1,60 @@
+import random
+import re
+
+import pytest
+
+from nlp_utils import SimpleNLP, fold_query
+
+
+def test_fold_query():
+    assert fold_query("  Back  pain??") == fold_query("back-pain") == "back|pain"
+    assert fold_query("I feel low-energy") != fold_query("i feel LOW ENERGY!") == "i feel low energy"
+
+
+@pytest.mark.parametrize("whole_word", [False, True])
+def test_texts_that_fold_alike_analyze_alike(whole_word):
+    """The analysis cache serves every text with the same fold_query key from one analysis."""
+    rng = random.Random(3)
+    nlp = SimpleNLP(whole_word=whole_word, ner_mode="never")
+    words = [kw for keywords in nlp.intents.values() for kw in keywords] + list(nlp.gazetteer) + ["I", "5", "x_y"]
+    separators = [" ", "  ", "-", "? ", ", ", "...", "\t"]
+    seen = {}
+    for _ in range(5000):
+        text = rng.choice(["", " ", "("])
+        for word in rng.choices(words, k=rng.randint(1, 5)):
+            text += (word.upper() if rng.random() < 0.2 else word) + rng.choice(separators)
+        analysis = nlp.detect_intent(text), nlp.extract_entities(text)
+        assert seen.setdefault(fold_query(text), analysis) == analysis, text
+
+
+def reference_intent(intents, text, whole_word=False):
+    """The original implementation, one search per keyword per intent; whole_word adds word boundaries."""
+    text_lower = text.lower()
+    scores = {}
+    for intent, keywords in intents.items():
+        if whole_word:
+            score = sum(1 for kw in keywords if re.search(r"\b" + re.escape(kw) + r"\b", text_lower))
+        else:
+            score = sum(1 for kw in keywords if kw in text_lower)
+        if score > 0:
+            scores[intent] = score
+    if not scores:
+        return "general_health"
+    return max(scores, key=scores.get)
+
+
+@pytest.mark.parametrize("whole_word", [False, True])
+def test_detect_intent_matches_the_original(whole_word):
+    """Substring mode must return exactly the original intents; whole-word mode those of a word-boundary search."""
+    rng = random.Random(3)
+    nlp = SimpleNLP(whole_word=whole_word)
+    vocabulary = [kw for keywords in nlp.intents.values() for kw in keywords]
+    filler = ["i", "want", "to", "my", "great", "brunch", "today", "after", "the", "how", "can", "feel",
+              "better", "week", "morning", "what", "should", "do", "about", "really", "with", "some"]
+    for _ in range(3000):
+        words = [rng.choice(filler) for _ in range(rng.randint(4, 16))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(vocabulary).capitalize())
+        # Keywords glued to their neighbours only match as substrings
+        text = rng.choice([" ", "", "-"]).join(words) + rng.choice(["?", ".", "!"])
+        assert nlp.detect_intent(text) == reference_intent(nlp.intents, text, whole_word), text
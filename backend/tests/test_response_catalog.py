@@ -0,0 +1,41 @@
+import json
+import os
+
+from response_catalog import ResponseCatalog
+
+
+def write_catalog(path, text, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        if text is None:
+            f.write("{not json")
+        else:
+            json.dump({"version": 1, "responses": {"general_health": [text]}}, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_compose_reloads_a_changed_file(tmp_path):
+    path = str(tmp_path / "responses.json")
+    write_catalog(path, "first", 1_000_000)
+    catalog = ResponseCatalog(path, check_interval=1e-9)
+    assert catalog.compose("general_health", []) == "first"
+
+    write_catalog(path, "second", 1_000_001)
+    assert catalog.compose("general_health", []) == "second"
+
+    # A broken edit keeps the previous catalog until the file is fixed
+    write_catalog(path, None, 1_000_002)
+    assert catalog.compose("general_health", []) == "second"
+    assert catalog.error
+    write_catalog(path, "third", 1_000_003)
+    assert catalog.compose("general_health", []) == "third"
+    assert catalog.error is None
+
+
+def test_no_check_without_interval(tmp_path):
+    path = str(tmp_path / "responses.json")
+    write_catalog(path, "first", 1_000_000)
+    catalog = ResponseCatalog(path)
+    write_catalog(path, "second", 1_000_001)
+    assert catalog.compose("general_health", []) == "first"
+    assert catalog.reload()
+    assert catalog.compose("general_health", []) == "second"
@@ -0,0 +1,165 @@
+import os
+import pickle
+from datetime import datetime, timedelta
+
+import pytest
+
+from activity_store import ActivityStore
+from storage import SNAPSHOT_FILE, SQLiteBackend, SegmentLogBackend, restore, save_snapshot
+
+T0 = datetime(2024, 3, 1, 8, 0)
+
+
+def entry(i, **fields):
+    log = {"user_id": f"u{i % 3}", "activity_type": "meal", "details": f"d{i}", "value": float(i),
+           "timestamp": T0 + timedelta(minutes=i)}
+    log.update(fields)
+    return log
+
+
+def write(backend, entries):
+    """Submits one entry per request and returns the assigned ids."""
+    futures = [backend.submit([e]) for e in entries]
+    return [future.result()[0] for future in futures]
+
+
+@pytest.fixture(params=["sqlite", "segment"])
+def open_backend(request, tmp_path):
+    """Opens (and later closes) backends of one kind on the same storage."""
+    opened = []
+
+    def make(**kwargs):
+        if request.param == "sqlite":
+            backend = SQLiteBackend(str(tmp_path / "activity_logs.db"), **kwargs)
+        else:
+            backend = SegmentLogBackend(str(tmp_path / "segments"), **kwargs)
+        opened.append(backend)
+        return backend
+
+    yield make
+    for backend in opened:
+        if backend._writer.is_alive():
+            backend.close()
+
+
+def test_replay_returns_what_was_written(open_backend):
+    backend = open_backend()
+    ids = write(backend, [entry(i) for i in range(50)])
+    assert ids == list(range(1, 51))
+    backend.close()
+
+    replayed = list(open_backend().replay(after_id=20))
+    assert [e["id"] for e in replayed] == list(range(21, 51))
+    assert replayed[0] == dict(entry(20), id=21)
+
+
+def test_bad_entry_fails_only_its_own_request(open_backend):
+    backend = open_backend(commit_interval=0.2)
+    futures = [backend.submit([entry(0)]), backend.submit([entry(1, value=float("nan"))]),
+               backend.submit([entry(2, details="\ud800")]), backend.submit([entry(3), entry(4)])]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(len(future.result()))
+        except Exception:
+            outcomes.append("failed")
+    # The segment log encodes both (as NaN and a JSON escape); SQLite refuses them
+    assert outcomes[0] == 1 and outcomes[3] == 2
+    assert isinstance(backend, SegmentLogBackend) or outcomes[1:3] == ["failed", "failed"]
+    assert [e["details"] for e in backend.replay() if e["details"] in ("d0", "d3", "d4")] == ["d0", "d3", "d4"]
+
+
+def test_segment_recover_truncates_torn_tail(tmp_path):
+    directory = str(tmp_path / "segments")
+    backend = SegmentLogBackend(directory)
+    write(backend, [entry(i) for i in range(5)])
+    backend.close()
+    (path,) = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".log")]
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'{"id":6,"timesta')  # Crash mid-write
+
+    backend = SegmentLogBackend(directory)
+    assert os.path.getsize(path) == size
+    assert write(backend, [entry(5)]) == [6]
+    assert [e["id"] for e in backend.replay()] == list(range(1, 7))
+    backend.close()
+
+
+def test_segment_replay_skips_covered_segments(tmp_path):
+    directory = str(tmp_path / "segments")
+    backend = SegmentLogBackend(directory, segment_bytes=500)
+    for i in range(40):  # One commit each, so segments roll over every few entries
+        write(backend, [entry(i)])
+    backend.close()
+    segments = sorted(name for name in os.listdir(directory) if name.endswith(".log"))
+    assert len(segments) > 3
+    first_ids = [int(name[8:-4]) for name in segments]
+
+    # Segments wholly before after_id are never opened, so corrupting them changes nothing
+    for name in segments[:2]:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(b"not json\n")
+    backend = SegmentLogBackend(directory)
+    after_id = first_ids[2] - 1
+    assert [e["id"] for e in backend.replay(after_id=after_id)] == list(range(after_id + 1, 41))
+    backend.close()
+
+
+def test_segment_directory_has_a_single_writer(tmp_path):
+    backend = SegmentLogBackend(str(tmp_path / "segments"))
+    with pytest.raises(RuntimeError):
+        SegmentLogBackend(str(tmp_path / "segments"))
+    backend.close()
+    SegmentLogBackend(str(tmp_path / "segments")).close()
+
+
+def test_snapshot_covers_only_the_gap_free_prefix(tmp_path):
+    store = ActivityStore(dict(entry(i), id=i) for i in (1, 2, 3, 5, 6))
+    assert save_snapshot(store, str(tmp_path)) == 3
+    with open(tmp_path / SNAPSHOT_FILE, "rb") as f:
+        snapshot = pickle.load(f)
+    assert snapshot["last_id"] == 3
+    assert sorted(e["id"] for e in snapshot["entries"]) == [1, 2, 3]
+
+
+def test_restore_is_snapshot_plus_replay(open_backend, tmp_path):
+    backend = open_backend()
+    entries = [entry(i) for i in range(30)]
+    for e, log_id in zip(entries, write(backend, entries)):
+        e["id"] = log_id
+    backend.close()
+    save_snapshot(ActivityStore(entries[:20]), str(tmp_path))
+    # Snapshot entries must come from the snapshot, not the log: mark them
+    with open(tmp_path / SNAPSHOT_FILE, "rb") as f:
+        snapshot = pickle.load(f)
+    for e in snapshot["entries"]:
+        e["details"] = "from snapshot"
+    with open(tmp_path / SNAPSHOT_FILE, "wb") as f:
+        pickle.dump(snapshot, f)
+
+    store = ActivityStore()
+    assert restore(store, open_backend(), str(tmp_path)) == 30
+    details = {e["id"]: e["details"] for e in store}
+    assert sorted(details) == list(range(1, 31))
+    assert all(details[i] == "from snapshot" for i in range(1, 21))
+    assert all(details[i] == f"d{i - 1}" for i in range(21, 31))
+
+
+def test_sqlite_tail_returns_only_peer_writes(tmp_path):
+    path = str(tmp_path / "activity_logs.db")
+    mine, peer = SQLiteBackend(path), SQLiteBackend(path)
+    try:
+        assert list(mine.replay()) == []
+        own = write(mine, [entry(0), entry(1)])
+        theirs = write(peer, [entry(2)])
+        own += write(mine, [entry(3)])
+        tailed = mine.tail()
+        assert [e["id"] for e in tailed] == theirs
+        assert tailed[0]["details"] == "d2"
+        assert mine.tail() == []
+        assert not mine._own_ids  # Own ids are forgotten once tail has passed them
+        assert [e["id"] for e in peer.tail()] == own
+    finally:
+        mine.close()
+        peer.close()
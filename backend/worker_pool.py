@@ -0,0 +1,100 @@
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class PoolBusyError(Exception):
+    """Raised when the pool already holds as many tasks as it may queue."""
+
+
+def _timed_call(submitted: float, fn: Callable, args: Tuple) -> Tuple[float, Any]:
+    # time.monotonic is system-wide, so this also holds inside a worker process
+    waited = time.monotonic() - submitted
+    return waited, fn(*args)
+
+
+class WorkerPool:
+    """Runs CPU-bound work off the event loop in a bounded thread or process pool.
+
+    At most `max_workers` tasks run and at most `max_queue` more wait; beyond
+    that `run` raises PoolBusyError instead of letting the backlog grow.
+    With `max_workers=0` work runs inline on the event loop.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 64, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        if max_workers > 0:
+            if kind == "process":
+                # Ask for fork explicitly: the default start method is spawn on macOS and
+                # forkserver on Linux from Python 3.14, and those would re-import the app
+                # in every worker instead of inheriting the already-loaded models
+                if "fork" not in multiprocessing.get_all_start_methods():
+                    raise ValueError("A process pool needs the fork start method, which this platform lacks")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wellora-pool")
+
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._recent_waits: deque = deque(maxlen=1024)
+
+    @property
+    def queue_depth(self) -> int:
+        """Tasks submitted but not yet picked up by a worker."""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        if self._executor is None:
+            return fn(*args)
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise PoolBusyError(f"{self.in_flight} tasks already pending")
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            waited, result = await loop.run_in_executor(self._executor, _timed_call, time.monotonic(), fn, args)
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self._recent_waits.append(waited)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._recent_waits)
+
+        def recent_ms(pct: float) -> float:
+            return round(waits[int(pct * (len(waits) - 1))] * 1000, 3) if waits else 0.0
+
+        return {
+            "kind": self.kind if self._executor else "inline",
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_ms_p50": recent_ms(0.50),
+            "wait_ms_p99": recent_ms(0.99),
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)